@@ -1,10 +1,19 @@
-import tkinter as tk
-from tkinter import scrolledtext, messagebox, font, filedialog
+import io
 import numpy as np
 import math
-import threading
 import os
 import sys
+import argparse
+from tessellation_core import (find_stride_runs, decimal_width, encode_text, repetition_profile, rank_strides,
+                               make_candidates, select_candidates, paint_canvas, extract_lines,
+                               extract_blueprint, start_deadline, scan_stop, scan_candidates, varint_width, utf8_width,
+                               binary_line_savings, unpack_blueprint, write_blueprint, write_text_blueprint)
+from tessellation_blocks import FILE_COMMANDS, file_cli
+from tessellation_cache import ResultCache, cached_blueprint
+from tessellation_stats import EngineStats
+
+# Blueprint encodings: the 'length¬key‡remnant' string, or the varint-coded container.
+BLUEPRINT_FORMATS = ('text', 'binary')
 
 class VectorialTessellator:
     """
@@ -12,13 +21,60 @@ class VectorialTessellator:
     based on the principles of Vectorial Tessellation.
     """
 
-    def __init__(self, text: str, update_callback=None):
-        self.original_text = text
-        self.length = len(text)
+    # Dimensionality of the projections; tags binary blueprints and block containers.
+    ndim = 2
+
+    def __init__(self, text, update_callback=None, workers: int = 1,
+                 width_mode: str = 'autocorrelation', max_widths: int = 16,
+                 time_budget: float = None, max_candidates: int = None, cache=None,
+                 profile: bool = False, checkpoint=None):
+        # The text as compact integer code points, encoded once and shared by every projection.
+        self.codes = text if isinstance(text, np.ndarray) else encode_text(text)
+        self.length = len(self.codes)
         self.claimed_positions = np.zeros(self.length, dtype=bool)
         self.update_callback = update_callback or print
+        # Search-space pruning report from the last candidate scan.
+        self.search_stats = None
+        # The (char, shape) scan shards that candidates refer back to by index.
+        self.shards = []
+        # The candidates the last selection claimed, in claim order.
+        self.selected = make_candidates([], [], [], [])
+        # Vector descriptions of the selected lines, in claim order.
+        self.key = []
+        # Number of processes for the candidate scan; 1 keeps it in-process.
+        self.workers = workers
+        # 'autocorrelation' scans the max_widths most repetitive strides; 'exhaustive'
+        # scans every factor of the length plus the common widths.
+        if width_mode not in ('autocorrelation', 'exhaustive'):
+            raise ValueError(f"Unknown width mode: {width_mode}")
+        self.width_mode = width_mode
+        self.max_widths = max_widths
+        # Anytime mode: stop scanning after time_budget seconds or once max_candidates
+        # lines are found, and select from what was found so far (None = no limit).
+        self.time_budget = time_budget
+        self.max_candidates = max_candidates
+        # Encoding the savings model prices lines in; generate_blueprint sets it.
+        self.format = 'text'
+        # Optional ResultCache: each scanned shard's candidates are kept under a hash of
+        # the text, shard and format, so re-runs only scan the shards they have not seen.
+        self.cache = cache
+        # Phase timers and per-shard counters of the last run; profile=True adds cProfile.
+        self.stats = EngineStats(profile)
+        # Optional callable polled throughout the scan; raising from it abandons the run.
+        self.checkpoint = checkpoint
+
+    def _get_matrix_widths(self, stop=None):
+        """Chooses the matrix widths to scan, according to the width mode; `stop` cuts profiling short."""
+        if self.width_mode == 'exhaustive':
+            return self._get_all_matrix_widths()
+        # A width is only worth scanning if its columns can hold a profitable line.
+        min_rows = self._min_line_points(' ', (0, 1), self.format)
+        repetition, baseline, overlap = repetition_profile(self.codes, min_rows, self.length // (min_rows - 1), stop)
+        widths = rank_strides(repetition, self.max_widths, baseline, overlap)
+        # Width 1 is always scanned: it holds every run of adjacent repeats uncut.
+        return sorted(set(widths) | {1})
 
-    def _get_matrix_widths(self):
+    def _get_all_matrix_widths(self):
         """Find all factors of the length to use as matrix widths."""
         factors = {1}
         for i in range(2, int(math.sqrt(self.length)) + 1):
@@ -28,96 +84,135 @@ class VectorialTessellator:
         common_widths = {8, 10, 12, 16, 20, 30, 40, 50, 60, 80}
         return sorted(list(factors.union(common_widths)))
 
-    def _find_line_candidates_in_matrix(self, matrix: np.ndarray, char_to_find: str):
-        """Performs a brute-force search for lines in a single matrix projection."""
-        candidates = []
-        height, width = matrix.shape
-        char_locations = np.argwhere(matrix == char_to_find)
-
-        if len(char_locations) < 2:
-            return []
+    @staticmethod
+    def _min_line_points(char_to_find: str, shape, fmt: str = 'text'):
+        """Fewest points a line needs to outweigh its shortest possible description."""
+        if fmt == 'binary':
+            # One-byte start and count varints, plus one byte of savings.
+            code = ord(char_to_find)
+            return int(varint_width(code) + 2) // int(utf8_width(code)) + 1
+        # "(c,width,y,x,y,x)" with single-digit coordinates, plus one point of savings.
+        return 12 + len(char_to_find) + len(str(shape[1]))
 
-        for i in range(len(char_locations)):
-            for j in range(i + 1, len(char_locations)):
-                p1, p2 = char_locations[i], char_locations[j]
-                dy, dx = p2[0] - p1[0], p2[1] - p1[1]
-                
-                line_points = [tuple(p1), tuple(p2)]
-                
-                # Extend forward
-                curr_p = p2.copy()
-                while True:
-                    curr_p[0] += dy; curr_p[1] += dx
-                    if 0 <= curr_p[0] < height and 0 <= curr_p[1] < width and matrix[curr_p[0], curr_p[1]] == char_to_find:
-                        line_points.append(tuple(curr_p))
-                    else: break
+    @staticmethod
+    def _find_line_candidates_in_matrix(matrix: np.ndarray, char_to_find: str, fmt: str = 'text', offset: int = 0,
+                                        stop=None):
+        """
+        Finds every maximal line of a character in a single matrix projection.
+        Lines step by a reduced direction vector, so each one is found exactly once.
+        `offset` is the flat index of the matrix's first cell when it is a window
+        of whole rows further into the text; starts are reported and priced there.
+        `stop` cuts the scan short, as in find_stride_runs.
+        """
+        width = matrix.shape[1]
+        min_points = VectorialTessellator._min_line_points(char_to_find, matrix.shape, fmt)
+        starts, strides, counts = find_stride_runs(matrix, ord(char_to_find), min_points, primitive_only=True,
+                                                   stop=stop)
+        if not len(starts):
+            return make_candidates([], [], [], [])
+        starts = starts + offset
 
-                # Extend backward
-                curr_p = p1.copy()
-                while True:
-                    curr_p[0] -= dy; curr_p[1] -= dx
-                    if 0 <= curr_p[0] < height and 0 <= curr_p[1] < width and matrix[curr_p[0], curr_p[1]] == char_to_find:
-                        line_points.append(tuple(curr_p))
-                    else: break
+        if fmt == 'binary':
+            savings = binary_line_savings(ord(char_to_find), starts, counts)
+        else:
+            ends = starts + strides * (counts - 1)
+            y1, x1 = np.divmod(starts, width)
+            y2, x2 = np.divmod(ends, width)
+            desc_lengths = 7 + len(char_to_find) + len(str(width)) + sum(map(decimal_width, (y1, x1, y2, x2)))
+            savings = counts - desc_lengths
+        keep = savings > 0
+        return make_candidates(starts[keep], strides[keep], counts[keep], savings[keep])
 
-                if len(line_points) > 2:
-                    line_points = sorted(list(set(line_points)))
-                    start_point, end_point = line_points[0], line_points[-1]
-                    vector_desc = f"({char_to_find},{width},{start_point[0]},{start_point[1]},{end_point[0]},{end_point[1]})"
-                    savings = len(line_points) - len(vector_desc)
-                    if savings > 0:
-                        candidates.append({'savings': savings, 'width': width, 'points': line_points, 'desc': vector_desc})
-        return candidates
+    @staticmethod
+    def _describe_line(char_to_find: str, shape, start: int, end: int):
+        """Vector description of a line from its first to its last flat index."""
+        width = shape[1]
+        return f"({char_to_find},{width},{start // width},{start % width},{end // width},{end % width})"
 
     def generate_all_candidates(self):
         """Performs the 'All-Angles Scan' to find all vector candidates."""
         self.update_callback("Phase 1: Candidate Generation (All-Angles Scan)")
-        all_candidates, unique_chars = [], set(self.original_text)
-        widths = self._get_matrix_widths()
-
-        for i, char_to_find in enumerate(unique_chars):
-            self.update_callback(f"  Scanning for constellations of '{char_to_find}' ({i+1}/{len(unique_chars)})...")
-            for width in widths:
-                if width > self.length: continue
-                height = math.ceil(self.length / width)
-                padded_text = self.original_text.ljust(width * height, '\0')
-                matrix = np.array(list(padded_text)).reshape((height, width))
-                all_candidates.extend(self._find_line_candidates_in_matrix(matrix, char_to_find))
-        
-        unique_candidates, seen_descs = [], set()
-        for cand in all_candidates:
-            if cand['desc'] not in seen_descs:
-                unique_candidates.append(cand)
-                seen_descs.add(cand['desc'])
-        return unique_candidates
+        # Planning the widths counts against the budget as well.
+        deadline = start_deadline(self.time_budget)
+        stop = scan_stop(deadline, self.checkpoint)
+        widths = [width for width in self._get_matrix_widths(stop) if width <= self.length]
+        shapes = [(math.ceil(self.length / width), width) for width in widths]
+        return scan_candidates(self, shapes, self._find_line_candidates_in_matrix, deadline, self.update_callback,
+                               "  Scanning for constellations of '{char}' (shard {shard}/{shards})...",
+                               "  Merged {count} duplicate lines across widths.")
 
     def select_optimal_vectors(self, candidates):
         """Performs the 'Constellation Prize' selection process."""
         self.update_callback("\nPhase 2: Optimal Selection (The Constellation Prize)")
-        candidates.sort(key=lambda x: x['savings'], reverse=True)
         vector_key = []
-        for cand in candidates:
-            indices_to_claim = [y * cand['width'] + x for y, x in cand['points']]
-            can_be_claimed = all(idx < self.length and not self.claimed_positions[idx] for idx in indices_to_claim)
-            if can_be_claimed:
-                vector_key.append(cand['desc'])
-                for idx in indices_to_claim: self.claimed_positions[idx] = True
+        self.selected = candidates[select_candidates(candidates, self.claimed_positions)]
+        self.stats.record_selection(self.selected)
+        for shard, start, stride, count in self.selected[['shard', 'start', 'stride', 'count']].tolist():
+            char_to_find, shape = self.shards[shard]
+            vector_key.append(self._describe_line(char_to_find, shape, start, start + stride * (count - 1)))
+        self.key = vector_key
         return vector_key
 
-    def generate_blueprint(self):
-        """Generates the final Vector Key and Remnant Stream as a single compiled string."""
-        candidates = self.generate_all_candidates()
-        vector_key = self.select_optimal_vectors(candidates)
-        self.update_callback("\nPhase 3: Blueprint Generation")
-        remnant_stream = "".join([char for i, char in enumerate(self.original_text) if not self.claimed_positions[i]])
-        vector_key_string = "§".join(vector_key)
+    def generate_blueprint(self, format: str = 'text'):
+        """
+        Generates the final Vector Key and Remnant Stream, compiled into a
+        'length¬key‡remnant' string or, with format='binary', into the
+        varint-coded container as bytes. Lines are priced in the chosen format.
+        """
+        buffer = io.BytesIO()
+        self.write_blueprint(buffer, format)
+        return buffer.getvalue() if format == 'binary' else buffer.getvalue().decode('utf-8')
+
+    def write_blueprint(self, dst, format: str = 'binary'):
+        """
+        Compiles the blueprint straight into the binary stream `dst`, text
+        blueprints as UTF-8, with the remnant written out in chunks rather
+        than built as one string.
+        """
+        if format not in BLUEPRINT_FORMATS:
+            raise ValueError(f"Unknown blueprint format: {format}")
+        self.format = format
+        with self.stats.phase('candidates'):
+            candidates = self.generate_all_candidates()
+        with self.stats.phase('selection'):
+            vector_key = self.select_optimal_vectors(candidates)
+        with self.stats.phase('blueprint'):
+            self.compile_blueprint(dst, vector_key)
         self.update_callback("\nProcess Complete.")
-        return f"{self.length}¬{vector_key_string}‡{remnant_stream}"
-        
+
+    def compile_blueprint(self, dst, vector_key):
+        """Phase 3: writes the selected key and the unclaimed remnant to `dst` in self.format."""
+        self.update_callback("\nPhase 3: Blueprint Generation")
+        remnant = self.codes[~self.claimed_positions]
+        if self.format == 'binary':
+            codes = [ord(self.shards[shard][0]) for shard in self.selected['shard'].tolist()]
+            write_blueprint(dst, self.ndim, self.length, codes, self.selected['start'], self.selected['stride'],
+                            self.selected['count'], remnant)
+        else:
+            write_text_blueprint(dst, self.length, vector_key, remnant)
+
     @staticmethod
     def reconstruct(compiled_string):
-        """Re-paints the starfield from the compiled string blueprint."""
-        # Decompile the blueprint string
+        """Re-paints the starfield from a compiled blueprint, string or binary."""
+        if isinstance(compiled_string, (bytes, bytearray, memoryview)):
+            _, original_length, lines, remnant_stream = unpack_blueprint(compiled_string)
+            return paint_canvas(original_length, lines, remnant_stream)
+        return paint_canvas(*VectorialTessellator._decompile(compiled_string))
+
+    @staticmethod
+    def extract(compiled_string, start: int, end: int):
+        """
+        Characters [start, end) of the original text, decoded from the
+        blueprint without re-painting the rest of the starfield.
+        """
+        if isinstance(compiled_string, (bytes, bytearray, memoryview)):
+            return extract_blueprint(compiled_string, start, end)
+        original_length, lines, remnant_stream = VectorialTessellator._decompile(compiled_string)
+        return extract_lines(original_length, list(lines), remnant_stream, start, end)
+
+    @staticmethod
+    def _decompile(compiled_string):
+        """Splits a blueprint string into its length, its lines in stride form and its remnant."""
         try:
             length_part, main_part = compiled_string.split('¬', 1)
             original_length = int(length_part)
@@ -126,179 +221,56 @@ class VectorialTessellator:
             raise ValueError("Invalid blueprint format. Expected 'length¬key‡remnant'.")
 
         vector_key = key_string.split('§') if key_string else []
-        
-        canvas = ['\0'] * original_length
-        for vector_desc in vector_key:
-            try:
-                parts = vector_desc.strip('()').split(',')
-                char, width, y1, x1, y2, x2 = parts[0], int(parts[1]), int(parts[2]), int(parts[3]), int(parts[4]), int(parts[5])
-            except (ValueError, IndexError):
-                raise ValueError(f"Malformed vector in key: {vector_desc}")
 
-            dx, dy = abs(x2 - x1), -abs(y2 - y1)
-            sx, sy = 1 if x1 < x2 else -1, 1 if y1 < y2 else -1
-            err, cx, cy = dx + dy, x1, y1
-            while True:
-                linear_index = cy * width + cx
-                if linear_index < original_length: canvas[linear_index] = char
-                if cx == x2 and cy == y2: break
-                e2 = 2 * err
-                if e2 >= dy: err += dy; cx += sx
-                if e2 <= dx: err += dx; cy += sy
+        def lines():
+            for vector_desc in vector_key:
+                try:
+                    # The character comes first and may itself be ',' or ')', so split from the right.
+                    parts = vector_desc[1:-1].rsplit(',', 5)
+                    char, width, y1, x1, y2, x2 = parts[0], int(parts[1]), int(parts[2]), int(parts[3]), int(parts[4]), int(parts[5])
+                except (ValueError, IndexError):
+                    raise ValueError(f"Malformed vector in key: {vector_desc}")
+                # The reduced direction vector is exactly the line's step; in the
+                # flat text the line is an arithmetic progression.
+                steps = math.gcd(y2 - y1, x2 - x1)
+                sy, sx = ((y2 - y1) // steps, (x2 - x1) // steps) if steps else (0, 0)
+                yield char, y1 * width + x1, sy * width + sx, steps + 1
 
-        remnant_iter = iter(remnant_stream)
-        for i in range(original_length):
-            if canvas[i] == '\0':
-                try: canvas[i] = next(remnant_iter)
-                except StopIteration: pass
-                    
-        return "".join(canvas).replace('\0', '')
+        return original_length, lines(), remnant_stream
 
-class App(tk.Tk):
-    def __init__(self):
-        super().__init__()
-        self.title("Vectorial Tessellation Engine")
-        self.geometry("800x600")
-        self.configure(bg="#f0f0f0")
-        
-        # --- UI Elements ---
-        default_font = font.nametofont("TkDefaultFont")
-        default_font.configure(family="Helvetica", size=10)
-        mono_font = font.Font(family="Courier New", size=10)
+def __getattr__(name):
+    # The Tk front end lives in tessellation_gui and is only imported when asked
+    # for, so the engine itself loads without tkinter.
+    if name == 'App':
+        from tessellation_gui import App
+        return App
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-        # Input Frame
-        input_frame = tk.Frame(self, padx=10, pady=10, bg="#f0f0f0")
-        input_frame.pack(fill=tk.X)
-        
-        input_label_frame = tk.Frame(input_frame, bg="#f0f0f0")
-        input_label_frame.pack(fill=tk.X)
-        tk.Label(input_label_frame, text="Original String:", bg="#f0f0f0", font=default_font).pack(side=tk.LEFT)
-        tk.Button(input_label_frame, text="Load from File...", command=self.load_file).pack(side=tk.RIGHT)
-        
-        self.input_text = scrolledtext.ScrolledText(input_frame, height=8, font=mono_font, wrap=tk.WORD)
-        self.input_text.pack(fill=tk.X, expand=True)
-
-        # Control Frame
-        control_frame = tk.Frame(self, padx=10, pady=5, bg="#f0f0f0")
-        control_frame.pack(fill=tk.X)
-        self.compress_button = tk.Button(control_frame, text="Generate Blueprint", command=self.run_compression)
-        self.compress_button.pack(side=tk.LEFT)
-        self.decompress_button = tk.Button(control_frame, text="Reconstruct from Blueprint", command=self.run_reconstruction)
-        self.decompress_button.pack(side=tk.LEFT, padx=5)
-        
-        # Results Frame
-        results_frame = tk.Frame(self, padx=10, pady=10, bg="#f0f0f0")
-        results_frame.pack(fill=tk.BOTH, expand=True)
-        tk.Label(results_frame, text="Compiled Blueprint:", bg="#f0f0f0", font=default_font).pack(anchor=tk.W)
-        self.blueprint_text = scrolledtext.ScrolledText(results_frame, height=8, font=mono_font, wrap=tk.WORD)
-        self.blueprint_text.pack(fill=tk.X, expand=True)
-        
-        tk.Label(results_frame, text="Reconstructed String:", bg="#f0f0f0", font=default_font).pack(anchor=tk.W, pady=(10, 0))
-        self.reconstructed_text = scrolledtext.ScrolledText(results_frame, height=8, font=mono_font, wrap=tk.WORD, state=tk.DISABLED)
-        self.reconstructed_text.pack(fill=tk.X, expand=True)
-        
-        # Status/Log
-        status_frame = tk.Frame(self, padx=10, pady=5, bg="#f0f0f0")
-        status_frame.pack(fill=tk.X)
-        self.status_label = tk.Label(status_frame, text="Status: Idle", bg="#f0f0f0", anchor=tk.W)
-        self.status_label.pack(fill=tk.X)
-        
-    def log_message(self, message):
-        self.status_label.config(text=f"Status: {message.strip()}")
-        self.update_idletasks() # Force UI update
-
-    def load_file(self):
-        filepath = filedialog.askopenfilename(
-            title="Open Text File",
-            filetypes=(("Text Files", "*.txt"), ("All files", "*.*"))
-        )
-        if not filepath:
-            return
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
-                self.input_text.delete("1.0", tk.END)
-                self.input_text.insert("1.0", content)
-                self.log_message(f"Loaded file: {os.path.basename(filepath)}")
-        except Exception as e:
-            messagebox.showerror("File Error", f"Failed to read file:\n{e}")
-
-    def run_compression(self):
-        original_string = self.input_text.get("1.0", tk.END).strip()
-        if not original_string:
-            messagebox.showerror("Error", "Input string is empty.")
-            return
-
-        self.compress_button.config(state=tk.DISABLED)
-        self.decompress_button.config(state=tk.DISABLED)
-        self.blueprint_text.delete("1.0", tk.END)
-        self.reconstructed_text.config(state=tk.NORMAL)
-        self.reconstructed_text.delete("1.0", tk.END)
-        self.reconstructed_text.config(state=tk.DISABLED)
-
-        # Run tessellation in a separate thread to keep the GUI responsive
-        threading.Thread(target=self.compression_thread, args=(original_string,)).start()
-
-    def compression_thread(self, original_string):
-        try:
-            tessellator = VectorialTessellator(original_string, update_callback=self.log_message)
-            compiled_blueprint = tessellator.generate_blueprint()
-            
-            self.blueprint_text.insert("1.0", compiled_blueprint)
-            
-            original_size = len(original_string)
-            compressed_size = len(compiled_blueprint)
-            reduction = (1 - compressed_size / original_size) * 100 if original_size > 0 else 0
-            
-            self.log_message(f"Analysis Complete. Reduction: {reduction:.2f}%")
-        except Exception as e:
-            self.log_message(f"Error during compression: {e}")
-        finally:
-            self.compress_button.config(state=tk.NORMAL)
-            self.decompress_button.config(state=tk.NORMAL)
-
-
-    def run_reconstruction(self):
-        compiled_string = self.blueprint_text.get("1.0", tk.END).strip()
-        if not compiled_string or '¬' not in compiled_string:
-            messagebox.showerror("Error", "Compiled blueprint is empty or invalid.")
-            return
-            
-        try:
-            reconstructed_string = VectorialTessellator.reconstruct(compiled_string)
-            self.reconstructed_text.config(state=tk.NORMAL)
-            self.reconstructed_text.delete("1.0", tk.END)
-            self.reconstructed_text.insert("1.0", reconstructed_string)
-            self.reconstructed_text.config(state=tk.DISABLED)
-            
-            # Verification
-            original_string = self.input_text.get("1.0", tk.END).strip()
-            if original_string == reconstructed_string:
-                messagebox.showinfo("Verification", "Success: Reconstructed string matches the original.")
-            else:
-                messagebox.showwarning("Verification", "Failure: Reconstructed string does not match the original.")
-        except Exception as e:
-            messagebox.showerror("Reconstruction Error", f"An error occurred: {e}")
-
-def run_cli(input_string):
-    """Runs the engine in command-line mode."""
+def run_cli(input_string, format='text', **engine_options):
+    """Runs the engine in command-line mode; engine_options go to VectorialTessellator."""
     print(f"Original String ({len(input_string)} chars):")
     print(input_string)
     print("-" * 30)
 
-    tessellator = VectorialTessellator(input_string, update_callback=print)
-    compiled_blueprint = tessellator.generate_blueprint()
+    tessellator = VectorialTessellator(input_string, update_callback=print, **engine_options)
+    # With a cache, the same text and options are only ever tessellated once.
+    compiled_blueprint = cached_blueprint(tessellator, format, engine_options)
 
     print("\n--- COMPILED BLUEPRINT ---")
-    print(f"\"{compiled_blueprint}\"")
+    if format == 'binary':
+        print(compiled_blueprint.hex())
+    else:
+        print(f"\"{compiled_blueprint}\"")
     print("-" * 30)
     
-    original_size = len(input_string)
+    # The binary container is measured against the UTF-8 bytes it replaces.
+    unit = "bytes" if format == 'binary' else "characters"
+    original_size = len(input_string.encode('utf-8')) if format == 'binary' else len(input_string)
     compressed_size = len(compiled_blueprint)
     
     print("\nSize Analysis:")
-    print(f"  - Original: {original_size} characters")
-    print(f"  - Compressed: {compressed_size} characters")
+    print(f"  - Original: {original_size} {unit}")
+    print(f"  - Compressed: {compressed_size} {unit}")
     if original_size > 0:
         ratio = (1 - compressed_size / original_size) * 100
         print(f"  - Reduction: {ratio:.2f}%")
@@ -309,16 +281,54 @@ def run_cli(input_string):
     
     print("\nVerification:")
     print(f"  - Lossless: {reconstructed_string == input_string}")
+    if tessellator.cache is not None:
+        stats = tessellator.cache.stats()
+        print(f"  - Cache: {stats['hits']} hits, {stats['misses']} misses")
+    report = tessellator.stats.report()
+    if report:
+        print("\n" + report)
 
 if __name__ == "__main__":
+    if sys.argv[1:2] and sys.argv[1] in FILE_COMMANDS:
+        # File mode: `compress IN OUT` / `decompress IN OUT`, streamed with no echo.
+        sys.exit(file_cli(VectorialTessellator, sys.argv[1:]))
+
+    parser = argparse.ArgumentParser(description="Vectorial Tessellation Engine")
+    parser.add_argument("text", nargs="*", help="string to analyze; opens the GUI (or a prompt) when omitted")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes for the candidate scan (0 = one per CPU, default: 1)")
+    parser.add_argument("--width-mode", choices=("autocorrelation", "exhaustive"), default="autocorrelation",
+                        help="rank matrix widths by FFT autocorrelation, or scan every factor of the length")
+    parser.add_argument("--max-widths", type=int, default=16,
+                        help="widths scanned in autocorrelation mode (default: 16)")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="seconds to spend scanning before selecting from what was found")
+    parser.add_argument("--max-candidates", type=int, default=None,
+                        help="stop scanning once this many lines are found")
+    parser.add_argument("--format", choices=BLUEPRINT_FORMATS, default="text",
+                        help="compile to the 'length¬key‡remnant' string or the varint-coded binary container")
+    parser.add_argument("--cache-dir", default=None,
+                        help="directory caching blueprints and per-shard candidates across runs")
+    parser.add_argument("--cache-size", type=int, default=1 << 30,
+                        help="bytes the cache directory may hold before evicting (default: 1 GiB)")
+    parser.add_argument("--profile", action="store_true",
+                        help="run the engine under cProfile and print the hottest functions")
+    args = parser.parse_args()
+    engine_options = dict(workers=args.workers or os.cpu_count(), width_mode=args.width_mode,
+                          max_widths=args.max_widths, time_budget=args.time_budget,
+                          max_candidates=args.max_candidates, profile=args.profile)
+    if args.cache_dir:
+        engine_options['cache'] = ResultCache(directory=args.cache_dir, max_bytes=args.cache_size)
+
     # Check if a display is available to determine execution mode
     display_available = bool(os.environ.get('DISPLAY', None))
     
     # If arguments are passed, always run in CLI mode
-    if len(sys.argv) > 1:
-        input_data = " ".join(sys.argv[1:])
-        run_cli(input_data)
+    if args.text:
+        input_data = " ".join(args.text)
+        run_cli(input_data, args.format, **engine_options)
     elif display_available:
+        from tessellation_gui import App
         app = App()
         app.mainloop()
     else:
@@ -328,8 +338,8 @@ if __name__ == "__main__":
             input_string = input("Please enter the string to analyze: ")
             if input_string:
                 print("-" * 30)
-                run_cli(input_string)
+                run_cli(input_string, args.format, **engine_options)
             else:
                 print("No input provided. Exiting.")
         except (EOFError, KeyboardInterrupt):
-            print("\nOperation cancelled by user. Exiting.")
+            print("\nOperation cancelled by user. Exiting.")
\ No newline at end of file
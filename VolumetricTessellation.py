@@ -1,5 +1,21 @@
+import io
 import numpy as np
 import math
+import argparse
+import itertools
+import os
+import sys
+from tessellation_core import (find_stride_runs, decimal_width, encode_text, repetition_profile, rank_strides,
+                               stride_runs, run_savings, make_candidates, select_candidates, paint_canvas,
+                               extract_lines, extract_blueprint, start_deadline, scan_stop, scan_candidates,
+                               varint_width, utf8_width, binary_line_savings, unpack_blueprint,
+                               write_blueprint, write_text_blueprint)
+from tessellation_blocks import FILE_COMMANDS, file_cli
+from tessellation_cache import ResultCache, cached_blueprint
+from tessellation_stats import EngineStats
+
+# Blueprint encodings: the 'length¬key‡remnant' string, or the varint-coded container.
+BLUEPRINT_FORMATS = ('text', 'binary')
 
 class VolumetricTessellator:
     """
@@ -7,14 +23,93 @@ class VolumetricTessellator:
     based on the principles of Volumetric Tessellation.
     """
 
-    def __init__(self, text: str, update_callback=None):
-        self.original_text = text
-        self.length = len(text)
+    # Dimensionality of the projections; tags binary blueprints and block containers.
+    ndim = 3
+
+    def __init__(self, text, update_callback=None, workers: int = 1,
+                 volume_mode: str = 'autocorrelation', max_volumes: int = 12,
+                 time_budget: float = None, max_candidates: int = None, cache=None,
+                 profile: bool = False, checkpoint=None):
+        # The text as compact integer code points; every volume is a zero-copy reshape of it.
+        self.codes = text if isinstance(text, np.ndarray) else encode_text(text)
+        self.length = len(self.codes)
         self.claimed_positions = np.zeros(self.length, dtype=bool)
         # A simple callback for logging progress in a non-GUI environment
         self.log = update_callback or print
+        # Search-space pruning report from the last candidate scan.
+        self.search_stats = None
+        # The (char, dims) survey shards that candidates refer back to by index.
+        self.shards = []
+        # The candidates the last selection claimed, in claim order.
+        self.selected = make_candidates([], [], [], [])
+        # Vector descriptions of the selected filaments, in claim order.
+        self.key = []
+        # Number of processes for the survey; 1 keeps it in-process.
+        self.workers = workers
+        # 'autocorrelation' surveys the max_volumes best-scoring shapes, padded ones
+        # included; 'exhaustive' keeps the original divisor enumeration.
+        if volume_mode not in ('autocorrelation', 'exhaustive'):
+            raise ValueError(f"Unknown volume mode: {volume_mode}")
+        self.volume_mode = volume_mode
+        self.max_volumes = max_volumes
+        # Anytime mode: stop surveying after time_budget seconds or once max_candidates
+        # filaments are found, and select from what was found so far (None = no limit).
+        self.time_budget = time_budget
+        self.max_candidates = max_candidates
+        # Encoding the savings model prices filaments in; generate_blueprint sets it.
+        self.format = 'text'
+        # Optional ResultCache: each scanned shard's candidates are kept under a hash of
+        # the text, shard and format, so re-runs only scan the shards they have not seen.
+        self.cache = cache
+        # Phase timers and per-shard counters of the last run; profile=True adds cProfile.
+        self.stats = EngineStats(profile)
+        # Optional callable polled throughout the scan; raising from it abandons the run.
+        self.checkpoint = checkpoint
+
+    def _get_volume_permutations(self, stop=None):
+        """
+        Chooses the 3D matrix dimensions (pages, rows, cols) to survey.
+        Strides are shortlisted by FFT autocorrelation, and shapes are scored by
+        what filaments along their row stride (cols) or page stride
+        (rows * cols) could save, given how long that axis is. Orientation
+        matters, and the shape need not divide the length: the last page is
+        padded with '\0', just as the 2D engine pads its last row. `stop`
+        cuts the autocorrelation profile short.
+        """
+        if self.volume_mode == 'exhaustive':
+            return self._get_divisor_permutations()
+        if not self.length:
+            return []
+        min_points = self._min_line_points(' ', (1, 1, 1), self.format)
+        repetition, baseline, overlap = repetition_profile(self.codes, min_points, self.length // (min_points - 1),
+                                                           stop)
+        strides = rank_strides(repetition, 4 * self.max_volumes, baseline, overlap)
+        runs = {stride: stride_runs(self.codes, stride)[0] for stride in strides}
+
+        shapes = set()
+        for cols in strides:
+            shapes.add((1, math.ceil(self.length / cols), cols))
+            for page in strides:
+                if page > cols and page % cols == 0:
+                    shapes.add((math.ceil(self.length / page), page // cols, cols))
+        # Exact factorizations, in every orientation, compete on the same score.
+        for dims in self._get_divisor_permutations(limit=None):
+            shapes.update(itertools.permutations(dims))
+
+        def axis_savings(stride, points):
+            return run_savings(runs[stride], min_points, points) if stride in runs else 0
+
+        def score(dims):
+            # Filaments along an axis are cut at its length; the row and page
+            # strides mostly claim the same characters, so the better one counts.
+            pages, rows, cols = dims
+            return max(axis_savings(cols, rows), axis_savings(rows * cols, pages))
+
+        ranked = sorted((dims for dims in shapes if score(dims) > 0), key=lambda dims: (-score(dims), dims))
+        # A single row of the whole text is always surveyed, like width 1 in 2D.
+        return ranked[:self.max_volumes] + [(1, 1, self.length)]
 
-    def _get_volume_permutations(self):
+    def _get_divisor_permutations(self, limit=50):
         """
         Generates plausible 3D matrix dimensions (pages, rows, cols).
         This is a complex factorization problem; we simplify by iterating
@@ -31,120 +126,134 @@ class VolumetricTessellator:
                         cols = area // rows
                         permutations.add(tuple(sorted((pages, rows, cols))))
         # To avoid excessive computation, we'll limit the number of permutations.
-        # A more sophisticated approach would prune this list intelligently.
-        return sorted(list(permutations), key=lambda x: x[0]*x[1]*x[2])[:50] # Limit permutations for performance
+        return sorted(list(permutations), key=lambda x: x[0]*x[1]*x[2])[:limit]
 
+    @staticmethod
+    def _min_line_points(char_to_find: str, dims, fmt: str = 'text'):
+        """Fewest points a filament needs to outweigh its shortest possible description."""
+        if fmt == 'binary':
+            # One-byte start and count varints, plus one byte of savings.
+            code = ord(char_to_find)
+            return int(varint_width(code) + 2) // int(utf8_width(code)) + 1
+        # "(c,pages,rows,cols,z,y,x,z,y,x)" with single-digit coordinates, plus one point of savings.
+        return 18 + len(char_to_find) + len(f"{dims[0]}{dims[1]}{dims[2]}")
 
-    def _find_line_candidates_in_volume(self, volume: np.ndarray, char_to_find: str):
+    @staticmethod
+    def _find_line_candidates_in_volume(volume: np.ndarray, char_to_find: str, fmt: str = 'text', stop=None):
         """
-        Performs a brute-force search for 3D lines in a single volume projection.
-        This is computationally intensive and the heart of the "All-Skies Survey".
+        Finds every maximal 3D line of a character in a single volume projection.
+        This is the heart of the "All-Skies Survey". Lines step by a reduced
+        direction vector, so each filament is found exactly once. `stop` cuts
+        the survey short, as in find_stride_runs.
         """
-        candidates = []
         pages, rows, cols = volume.shape
-        char_locations = np.argwhere(volume == char_to_find)
+        min_points = VolumetricTessellator._min_line_points(char_to_find, volume.shape, fmt)
+        starts, strides, counts = find_stride_runs(volume, ord(char_to_find), min_points, primitive_only=True,
+                                                   stop=stop)
+        if not len(starts):
+            return make_candidates([], [], [], [])
 
-        if len(char_locations) < 2:
-            return []
+        if fmt == 'binary':
+            savings = binary_line_savings(ord(char_to_find), starts, counts)
+        else:
+            start_coords = np.unravel_index(starts, volume.shape)
+            end_coords = np.unravel_index(starts + strides * (counts - 1), volume.shape)
+            # Vector description: (char,pages,rows,cols,z1,y1,x1,z2,y2,x2)
+            desc_lengths = (11 + len(char_to_find) + len(f"{pages}{rows}{cols}")
+                            + sum(map(decimal_width, start_coords + end_coords)))
+            savings = counts - desc_lengths
+        keep = savings > 0
+        return make_candidates(starts[keep], strides[keep], counts[keep], savings[keep])
 
-        # Check lines between every pair of points
-        for i in range(len(char_locations)):
-            for j in range(i + 1, len(char_locations)):
-                p1, p2 = char_locations[i], char_locations[j]
-                dp, dr, dc = p2[0] - p1[0], p2[1] - p1[1], p2[2] - p1[2]
-                
-                line_points = [tuple(p1), tuple(p2)]
-                
-                # Extend forward
-                curr_p = p2.copy()
-                while True:
-                    curr_p[0] += dp; curr_p[1] += dr; curr_p[2] += dc
-                    if (0 <= curr_p[0] < pages and 0 <= curr_p[1] < rows and 0 <= curr_p[2] < cols
-                        and volume[tuple(curr_p)] == char_to_find):
-                        line_points.append(tuple(curr_p))
-                    else: break
-                
-                # Extend backward
-                curr_p = p1.copy()
-                while True:
-                    curr_p[0] -= dp; curr_p[1] -= dr; curr_p[2] -= dc
-                    if (0 <= curr_p[0] < pages and 0 <= curr_p[1] < rows and 0 <= curr_p[2] < cols
-                        and volume[tuple(curr_p)] == char_to_find):
-                        line_points.append(tuple(curr_p))
-                    else: break
-
-                if len(line_points) > 2:
-                    line_points = sorted(list(set(line_points)))
-                    start, end = line_points[0], line_points[-1]
-                    
-                    # Vector description: (char,pages,rows,cols,z1,y1,x1,z2,y2,x2)
-                    desc = f"({char_to_find},{pages},{rows},{cols},{start[0]},{start[1]},{start[2]},{end[0]},{end[1]},{end[2]})"
-                    savings = len(line_points) - len(desc)
-                    
-                    if savings > 0:
-                        candidates.append({'savings': savings, 'points': line_points, 'desc': desc})
-        return candidates
+    @staticmethod
+    def _describe_line(char_to_find: str, dims, start: int, end: int):
+        """Vector description of a filament from its first to its last flat index."""
+        pages, rows, cols = dims
+        (z1, y1, x1), (z2, y2, x2) = (np.unravel_index(index, dims) for index in (start, end))
+        return f"({char_to_find},{pages},{rows},{cols},{z1},{y1},{x1},{z2},{y2},{x2})"
 
     def generate_all_candidates(self):
         """Performs the 'All-Skies Survey' to find all filament candidates."""
         self.log("Phase 1: Candidate Generation (All-Skies Survey)")
-        all_candidates, unique_chars = [], set(self.original_text)
-        permutations = self._get_volume_permutations()
-
-        for i, char_to_find in enumerate(unique_chars):
-            self.log(f"  Surveying for '{char_to_find}' structures ({i+1}/{len(unique_chars)})...")
-            for dims in permutations:
-                pages, rows, cols = dims
-                # Ensure the dimensions match the length
-                if pages * rows * cols != self.length: continue
-                
-                volume = np.array(list(self.original_text)).reshape(dims)
-                all_candidates.extend(self._find_line_candidates_in_volume(volume, char_to_find))
-        
-        # Remove duplicate candidates
-        unique_candidates, seen_descs = [], set()
-        for cand in all_candidates:
-            if cand['desc'] not in seen_descs:
-                unique_candidates.append(cand)
-                seen_descs.add(cand['desc'])
-        return unique_candidates
+        # Planning the volumes counts against the budget as well.
+        deadline = start_deadline(self.time_budget)
+        stop = scan_stop(deadline, self.checkpoint)
+        return scan_candidates(self, self._get_volume_permutations(stop), self._find_line_candidates_in_volume,
+                               deadline, self.log, "  Surveying for '{char}' structures (shard {shard}/{shards})...",
+                               "  Merged {count} duplicate filaments across volumes.")
 
     def select_optimal_vectors(self, candidates):
         """Performs the 'Cosmological Principle' selection process."""
         self.log("\nPhase 2: Optimal Selection (The Cosmological Principle)")
-        candidates.sort(key=lambda x: x['savings'], reverse=True)
-        
         cosmological_key = []
-        for cand in candidates:
-            dims = tuple(map(int, cand['desc'].strip('()').split(',')[1:4]))
-            pages, rows, cols = dims
-            
-            # Convert matrix coordinates back to linear string indices
-            indices_to_claim = [p*rows*cols + r*cols + c for p, r, c in cand['points']]
-            
-            can_be_claimed = all(not self.claimed_positions[idx] for idx in indices_to_claim)
-            
-            if can_be_claimed:
-                cosmological_key.append(cand['desc'])
-                for idx in indices_to_claim: self.claimed_positions[idx] = True
-        
+        self.selected = candidates[select_candidates(candidates, self.claimed_positions)]
+        self.stats.record_selection(self.selected)
+        for shard, start, stride, count in self.selected[['shard', 'start', 'stride', 'count']].tolist():
+            char_to_find, dims = self.shards[shard]
+            cosmological_key.append(self._describe_line(char_to_find, dims, start, start + stride * (count - 1)))
+        self.key = cosmological_key
         return cosmological_key
 
-    def generate_blueprint(self):
-        """Generates the final Cosmological Key and Aperiodic Remnant."""
-        candidates = self.generate_all_candidates()
-        cosmological_key = self.select_optimal_vectors(candidates)
-        
-        self.log("\nPhase 3: Blueprint Generation")
-        remnant_stream = "".join([char for i, char in enumerate(self.original_text) if not self.claimed_positions[i]])
-        
-        key_string = "§".join(cosmological_key)
+    def generate_blueprint(self, format: str = 'text'):
+        """
+        Generates the final Cosmological Key and Aperiodic Remnant, as a
+        'length¬key‡remnant' string or, with format='binary', as the
+        varint-coded container in bytes.
+        """
+        buffer = io.BytesIO()
+        self.write_blueprint(buffer, format)
+        return buffer.getvalue() if format == 'binary' else buffer.getvalue().decode('utf-8')
+
+    def write_blueprint(self, dst, format: str = 'binary'):
+        """
+        Compiles the blueprint straight into the binary stream `dst`, text
+        blueprints as UTF-8, with the remnant written out in chunks rather
+        than built as one string.
+        """
+        if format not in BLUEPRINT_FORMATS:
+            raise ValueError(f"Unknown blueprint format: {format}")
+        self.format = format
+        with self.stats.phase('candidates'):
+            candidates = self.generate_all_candidates()
+        with self.stats.phase('selection'):
+            cosmological_key = self.select_optimal_vectors(candidates)
+        with self.stats.phase('blueprint'):
+            self.compile_blueprint(dst, cosmological_key)
         self.log("\nCosmology Engine analysis complete.")
-        return f"{self.length}¬{key_string}‡{remnant_stream}"
-        
+
+    def compile_blueprint(self, dst, cosmological_key):
+        """Phase 3: writes the selected key and the unclaimed remnant to `dst` in self.format."""
+        self.log("\nPhase 3: Blueprint Generation")
+        remnant = self.codes[~self.claimed_positions]
+        if self.format == 'binary':
+            codes = [ord(self.shards[shard][0]) for shard in self.selected['shard'].tolist()]
+            write_blueprint(dst, self.ndim, self.length, codes, self.selected['start'], self.selected['stride'],
+                            self.selected['count'], remnant)
+        else:
+            write_text_blueprint(dst, self.length, cosmological_key, remnant)
+
     @staticmethod
     def reconstruct(compiled_string):
-        """Re-runs the Big Bang from the blueprint."""
+        """Re-runs the Big Bang from the blueprint, string or binary."""
+        if isinstance(compiled_string, (bytes, bytearray, memoryview)):
+            _, original_length, filaments, remnant_stream = unpack_blueprint(compiled_string)
+            return paint_canvas(original_length, filaments, remnant_stream)
+        return paint_canvas(*VolumetricTessellator._decompile(compiled_string))
+
+    @staticmethod
+    def extract(compiled_string, start: int, end: int):
+        """
+        Characters [start, end) of the original text, decoded from the
+        blueprint without re-running the whole Big Bang.
+        """
+        if isinstance(compiled_string, (bytes, bytearray, memoryview)):
+            return extract_blueprint(compiled_string, start, end)
+        original_length, filaments, remnant_stream = VolumetricTessellator._decompile(compiled_string)
+        return extract_lines(original_length, list(filaments), remnant_stream, start, end)
+
+    @staticmethod
+    def _decompile(compiled_string):
+        """Splits a blueprint string into its length, its filaments in stride form and its remnant."""
         try:
             length_part, main_part = compiled_string.split('¬', 1)
             original_length = int(length_part)
@@ -153,53 +262,46 @@ class VolumetricTessellator:
             raise ValueError("Invalid blueprint format. Expected 'length¬key‡remnant'.")
 
         cosmological_key = key_string.split('§') if key_string else []
-        canvas = ['\0'] * original_length
-        
-        for vector_desc in cosmological_key:
-            parts = vector_desc.strip('()').split(',')
-            char, p, r, c, z1, y1, x1, z2, y2, x2 = [parts[0]] + [int(n) for n in parts[1:]]
-            
-            # Simple 3D DDA (Digital Differential Analyzer) for line drawing
-            dp, dr, dc = z2 - z1, y2 - y1, x2 - x1
-            steps = max(abs(dp), abs(dr), abs(dc))
-            
-            zp, rp, cp = z1, y1, x1
-            for _ in range(steps + 1):
-                pz, py, px = round(zp), round(rp), round(cp)
-                linear_index = pz * r * c + py * c + px
-                if linear_index < original_length:
-                    canvas[linear_index] = char
-                zp += dp / steps if steps != 0 else 0
-                rp += dr / steps if steps != 0 else 0
-                cp += dc / steps if steps != 0 else 0
-
-        remnant_iter = iter(remnant_stream)
-        for i in range(original_length):
-            if canvas[i] == '\0':
-                try: canvas[i] = next(remnant_iter)
-                except StopIteration: pass
-                    
-        return "".join(canvas).replace('\0', '')
-
-def run_cli(input_string):
-    """A command-line interface for the engine."""
+
+        def filaments():
+            for vector_desc in cosmological_key:
+                # The character comes first and may itself be ',' or ')', so split from the right.
+                parts = vector_desc[1:-1].rsplit(',', 9)
+                char, p, r, c, z1, y1, x1, z2, y2, x2 = [parts[0]] + [int(n) for n in parts[1:]]
+                # The reduced direction vector is exactly the filament's step; in
+                # the flat text the filament is an arithmetic progression.
+                dp, dr, dc = z2 - z1, y2 - y1, x2 - x1
+                steps = math.gcd(dp, dr, dc)
+                sp, sr, sc = (dp // steps, dr // steps, dc // steps) if steps else (0, 0, 0)
+                yield char, z1 * r * c + y1 * c + x1, sp * r * c + sr * c + sc, steps + 1
+
+        return original_length, filaments(), remnant_stream
+
+def run_cli(input_string, format='text', **engine_options):
+    """A command-line interface for the engine; engine_options go to VolumetricTessellator."""
     print(f"Original String ({len(input_string)} chars):")
     print(input_string)
     print("-" * 30)
 
-    tessellator = VolumetricTessellator(input_string)
-    compiled_blueprint = tessellator.generate_blueprint()
+    tessellator = VolumetricTessellator(input_string, **engine_options)
+    # With a cache, the same text and options are only ever tessellated once.
+    compiled_blueprint = cached_blueprint(tessellator, format, engine_options)
 
     print("\n--- COMPILED BLUEPRINT ---")
-    print(f"\"{compiled_blueprint}\"")
+    if format == 'binary':
+        print(compiled_blueprint.hex())
+    else:
+        print(f"\"{compiled_blueprint}\"")
     print("-" * 30)
     
-    original_size = len(input_string)
+    # The binary container is measured against the UTF-8 bytes it replaces.
+    unit = "bytes" if format == 'binary' else "characters"
+    original_size = len(input_string.encode('utf-8')) if format == 'binary' else len(input_string)
     compressed_size = len(compiled_blueprint)
     
     print("\nSize Analysis:")
-    print(f"  - Original: {original_size} characters")
-    print(f"  - Compressed: {compressed_size} characters")
+    print(f"  - Original: {original_size} {unit}")
+    print(f"  - Compressed: {compressed_size} {unit}")
     if original_size > 0:
         ratio = (1 - compressed_size / original_size) * 100
         print(f"  - Reduction: {ratio:.2f}%")
@@ -210,13 +312,50 @@ def run_cli(input_string):
     print("\nVerification:")
     print(f"  - Reconstructed String: \"{reconstructed_string}\"")
     print(f"  - Lossless: {reconstructed_string == input_string}")
+    if tessellator.cache is not None:
+        stats = tessellator.cache.stats()
+        print(f"  - Cache: {stats['hits']} hits, {stats['misses']} misses")
+    report = tessellator.stats.report()
+    if report:
+        print("\n" + report)
 
 if __name__ == "__main__":
-    # This example requires a string whose length has convenient 3D factors
-    # 60 = 3 * 4 * 5
-    # 'a' forms a major space diagonal. 'z' is noise.
-    test_string = "azzzazzzzzazzzzzzzazzzzzzzzzazzzzzzzzzzzazzzzzzzzzzzzzazzz"
-    test_string = test_string.ljust(60, 'z')
+    if sys.argv[1:2] and sys.argv[1] in FILE_COMMANDS:
+        # File mode: `compress IN OUT` / `decompress IN OUT`, streamed with no echo.
+        sys.exit(file_cli(VolumetricTessellator, sys.argv[1:]))
+
+    parser = argparse.ArgumentParser(description="Volumetric Tessellation Engine")
+    parser.add_argument("text", nargs="*", help="string to analyze (default: a 60-char demo string)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes for the survey (0 = one per CPU, default: 1)")
+    parser.add_argument("--volume-mode", choices=("autocorrelation", "exhaustive"), default="autocorrelation",
+                        help="rank volume shapes by FFT autocorrelation, or enumerate exact factorizations")
+    parser.add_argument("--max-volumes", type=int, default=12,
+                        help="volume shapes surveyed in autocorrelation mode (default: 12)")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="seconds to spend surveying before selecting from what was found")
+    parser.add_argument("--max-candidates", type=int, default=None,
+                        help="stop surveying once this many filaments are found")
+    parser.add_argument("--format", choices=BLUEPRINT_FORMATS, default="text",
+                        help="compile to the 'length¬key‡remnant' string or the varint-coded binary container")
+    parser.add_argument("--cache-dir", default=None,
+                        help="directory caching blueprints and per-shard candidates across runs")
+    parser.add_argument("--cache-size", type=int, default=1 << 30,
+                        help="bytes the cache directory may hold before evicting (default: 1 GiB)")
+    parser.add_argument("--profile", action="store_true",
+                        help="run the engine under cProfile and print the hottest functions")
+    args = parser.parse_args()
 
-    run_cli(test_string)
+    if args.text:
+        test_string = " ".join(args.text)
+    else:
+        # This example requires a string whose length has convenient 3D factors
+        # 60 = 3 * 4 * 5
+        # 'a' forms a major space diagonal. 'z' is noise.
+        test_string = "azzzazzzzzazzzzzzzazzzzzzzzzazzzzzzzzzzzazzzzzzzzzzzzzazzz"
+        test_string = test_string.ljust(60, 'z')
 
+    run_cli(test_string, args.format, workers=args.workers or os.cpu_count(), volume_mode=args.volume_mode,
+            max_volumes=args.max_volumes, time_budget=args.time_budget, max_candidates=args.max_candidates,
+            profile=args.profile,
+            cache=ResultCache(directory=args.cache_dir, max_bytes=args.cache_size) if args.cache_dir else None)
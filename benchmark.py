@@ -0,0 +1,336 @@
+import argparse
+import base64
+import io
+import json
+import platform
+import random
+import string
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from VectorialTessellation import VectorialTessellator
+from VolumetricTessellation import VolumetricTessellator
+
+ENGINES = {'vectorial': VectorialTessellator, 'volumetric': VolumetricTessellator}
+
+
+def periodic_log(size: int, seed: int = 0) -> str:
+    """A reproducible log-like text of `size` characters with fixed-width records."""
+    rng = random.Random(seed)
+    lines, total = [], 0
+    while total < size:
+        line = f"{len(lines):06d}|INFO|worker-{rng.randint(0, 3)}|status=OK|{rng.choice('xyz') * 8}\n"
+        lines.append(line)
+        total += len(line)
+    return "".join(lines)[:size]
+
+
+def tabular_dump(size: int, seed: int = 0) -> str:
+    """A reproducible CSV-like dump: aligned columns of ids, codes, amounts and flags."""
+    rng = random.Random(seed)
+    rows, total = ["id      ,code ,amount    ,flag\n"], 0
+    while total < size:
+        row = f"{len(rows):08d},{rng.choice(['AX', 'BY', 'CZ'])}-{rng.randint(0, 9)},{rng.uniform(0, 1e4):10.2f},{rng.choice('YN')}\n"
+        rows.append(row)
+        total += len(row)
+    return "".join(rows)[:size]
+
+
+def random_text(size: int, seed: int = 0) -> str:
+    """Uniformly random printable ASCII: the worst case, with almost no structure to find."""
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + string.punctuation + " "
+    return "".join(rng.choices(alphabet, k=size))
+
+
+def repetitive_runs(size: int, seed: int = 0) -> str:
+    """Long runs of a single character, a few hundred to a few thousand long."""
+    rng = random.Random(seed)
+    runs, total = [], 0
+    while total < size:
+        run = rng.choice('ab .') * rng.randint(200, 4000)
+        runs.append(run)
+        total += len(run)
+    return "".join(runs)[:size]
+
+
+def largest_prime(limit: int) -> int:
+    """The largest prime no greater than `limit` (2 for anything smaller)."""
+    def is_prime(n):
+        return n >= 2 and all(n % d for d in range(2, int(n ** 0.5) + 1))
+    return next((n for n in range(limit, 1, -1) if is_prime(n)), 2)
+
+
+def prime_length_log(size: int, seed: int = 0) -> str:
+    """A periodic log cut to a prime length, so no matrix or volume shape divides it exactly."""
+    return periodic_log(largest_prime(size), seed)
+
+
+def nul_padded_records(size: int, seed: int = 0) -> str:
+    """Fixed-width records padded with '\0', as in a C struct dump: NUL is data and must survive."""
+    rng = random.Random(seed)
+    records, total = [], 0
+    while total < size:
+        name = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 12)))
+        record = f"{len(records):06d}{name}".ljust(24, '\0') + rng.choice('AB') + '\0\0\n'
+        records.append(record)
+        total += len(record)
+    return "".join(records)[:size]
+
+
+# Default corpus sizes, small enough for the unbudgeted phases suite to finish in CI in a
+# few minutes (a 10 KB case alone can take half a minute). Large-file runs, 1 MB to 10 MB,
+# are opt-in through --sizes, best with a --time-budget.
+DEFAULT_SIZES = (1_000, 3_000)
+
+# Reproducible corpus generators by name: each takes a size in characters and a seed.
+CORPORA = {
+    'periodic-log': periodic_log,
+    'tabular': tabular_dump,
+    'random': random_text,
+    'repetitive': repetitive_runs,
+    'prime-length': prime_length_log,
+    'nul-padded': nul_padded_records,
+}
+
+
+def best_time(func, repeat: int) -> float:
+    """Fastest of `repeat` timed calls, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_reconstruct(sizes, engines, repeat=5, time_budget=1.0):
+    """
+    Decompression throughput: each corpus is compressed once (under
+    `time_budget`, since only the blueprint matters here), then reconstruct
+    is timed and reported in MB/s of reconstructed UTF-8 text.
+    """
+    for size in sizes:
+        text = periodic_log(size)
+        megabytes = len(text.encode('utf-8')) / 1e6
+        for name in engines:
+            engine = ENGINES[name]
+            blueprint = engine(text, update_callback=lambda message: None,
+                               time_budget=time_budget).generate_blueprint()
+            if engine.reconstruct(blueprint) != text:
+                raise AssertionError(f"{name} reconstruct is not lossless at {size} chars")
+            seconds = best_time(lambda: engine.reconstruct(blueprint), repeat)
+            print(f"  reconstruct  {name:<10} {size:>9} chars  {seconds * 1e3:9.2f} ms  "
+                  f"{megabytes / seconds:8.1f} MB/s")
+
+
+def run_phases(engine, text, fmt, time_budget=None):
+    """
+    One compression and reconstruction, phase by phase. Returns the seconds
+    each phase took, the blueprint, the tessellator that compiled it and
+    how many candidates its scan found.
+    """
+    seconds = {}
+    start = time.perf_counter()
+    tessellator = engine(text, update_callback=lambda message: None, time_budget=time_budget)
+    tessellator.format = fmt
+    seconds['encode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    candidates = tessellator.generate_all_candidates()
+    seconds['candidates'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    key = tessellator.select_optimal_vectors(candidates)
+    seconds['selection'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    tessellator.compile_blueprint(buffer, key)
+    blueprint = buffer.getvalue() if fmt == 'binary' else buffer.getvalue().decode('utf-8')
+    seconds['blueprint'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reconstructed = engine.reconstruct(blueprint)
+    seconds['reconstruct'] = time.perf_counter() - start
+    if reconstructed != text:
+        raise AssertionError(f"{engine.__name__} is not lossless on this corpus")
+    return seconds, blueprint, tessellator, len(candidates)
+
+
+def peak_memory(engine, text, fmt, time_budget=None) -> int:
+    """Peak bytes traced while compressing and reconstructing `text` once (NumPy buffers included)."""
+    tracemalloc.start()
+    try:
+        run_phases(engine, text, fmt, time_budget)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_phases(sizes, engines, corpora, fmt='binary', repeat=3, time_budget=None):
+    """
+    The regression suite: every corpus at every size through every engine.
+    Each phase keeps its fastest of `repeat` runs; peak memory comes from
+    one extra, traced run. Returns one record per case.
+    """
+    records = []
+    for corpus in corpora:
+        for size in sizes:
+            text = CORPORA[corpus](size)
+            text_bytes = len(text.encode('utf-8'))
+            for name in engines:
+                engine = ENGINES[name]
+                best = {}
+                for _ in range(repeat):
+                    seconds, blueprint, tessellator, candidates = run_phases(engine, text, fmt, time_budget)
+                    best = {phase: min(value, best.get(phase, value)) for phase, value in seconds.items()}
+                compress = sum(value for phase, value in best.items() if phase != 'reconstruct')
+                blueprint_bytes = len(blueprint) if fmt == 'binary' else len(blueprint.encode('utf-8'))
+                record = {
+                    'corpus': corpus, 'engine': name, 'format': fmt, 'chars': len(text), 'bytes': text_bytes,
+                    'seconds': best, 'compress_seconds': compress,
+                    'compress_mb_s': text_bytes / 1e6 / compress if compress else None,
+                    'reconstruct_mb_s': text_bytes / 1e6 / best['reconstruct'] if best['reconstruct'] else None,
+                    'peak_memory': peak_memory(engine, text, fmt, time_budget),
+                    'candidates': candidates, 'selected': len(tessellator.selected),
+                    'blueprint_bytes': blueprint_bytes, 'ratio': blueprint_bytes / text_bytes if text_bytes else None,
+                    'complete': tessellator.search_stats['complete'],
+                }
+                records.append(record)
+                print(f"  phases       {corpus:<13} {name:<10} {len(text):>9} chars  "
+                      f"compress {compress * 1e3:9.2f} ms  reconstruct {best['reconstruct'] * 1e3:8.2f} ms  "
+                      f"peak {record['peak_memory'] / 2**20:7.1f} MiB  ratio {record['ratio'] or 0:.3f}")
+    return records
+
+
+# Record fields compared against a baseline; each regresses when it grows by more than the threshold.
+REGRESSION_METRICS = ('compress_seconds', 'peak_memory', 'blueprint_bytes')
+
+
+def find_regressions(records, baseline, threshold):
+    """
+    Cases slower, hungrier or larger than in `baseline` (a previous report)
+    by more than `threshold`, as a fraction. Reconstruct time is compared
+    too. Cases the baseline does not have are skipped.
+    """
+    previous = {(r['corpus'], r['engine'], r['format'], r['chars']): r for r in baseline['results']}
+    regressions = []
+    for record in records:
+        old = previous.get((record['corpus'], record['engine'], record['format'], record['chars']))
+        if old is None:
+            continue
+        pairs = [(metric, record[metric], old[metric]) for metric in REGRESSION_METRICS]
+        pairs.append(('reconstruct_seconds', record['seconds']['reconstruct'], old['seconds']['reconstruct']))
+        for metric, new_value, old_value in pairs:
+            if old_value and new_value > old_value * (1 + threshold):
+                regressions.append(f"{record['corpus']} {record['engine']} {record['chars']} chars: "
+                                   f"{metric} {old_value:.6g} -> {new_value:.6g} (+{new_value / old_value - 1:.0%})")
+    return regressions
+
+
+def write_report(records, path):
+    """Writes the suite's records, with the interpreter and platform they ran on, as JSON."""
+    report = {'python': platform.python_version(), 'platform': platform.platform(),
+              'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': records}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+def check_parity(sizes, engines):
+    """
+    Server/library parity: each corpus goes through engine_server's /analyze
+    and straight through the library engine, in both formats, and the two
+    blueprints must be identical. Both searches run unbudgeted, so they are
+    deterministic. Skipped where Flask is not installed.
+    """
+    try:
+        from engine_server import app
+    except ImportError as e:
+        print(f"  parity       unavailable ({e})")
+        return
+    client = app.test_client()
+    for size in sizes:
+        text = periodic_log(size)
+        for name in engines:
+            for fmt in ('text', 'binary'):
+                response = client.post('/analyze', json={'text': text, 'engine': name, 'format': fmt})
+                served = response.get_json()['compiledBlueprint']
+                if fmt == 'binary':
+                    served = base64.b64decode(served)
+                expected = ENGINES[name](text, update_callback=lambda message: None).generate_blueprint(fmt)
+                if served != expected:
+                    raise AssertionError(f"{name} {fmt} blueprint from /analyze differs from the library at {size} chars")
+                print(f"  parity       {name:<10} {fmt:<6} {size:>9} chars  ok")
+
+
+# Cold-start cases: a fresh interpreter running each snippet, against a bare one.
+IMPORT_CASES = [
+    ("interpreter", "pass"),
+    ("tessellation_core", "import tessellation_core"),
+    ("vectorial engine", "from VectorialTessellation import VectorialTessellator"),
+    ("volumetric engine", "from VolumetricTessellation import VolumetricTessellator"),
+    ("headless cli", "import tessellation_cli"),
+    ("tk gui", "import tessellation_gui"),
+]
+
+
+def bench_import(repeat=5):
+    """
+    Cold-start latency: each case runs in a new interpreter, timed wall to
+    wall, and reports whether it pulled in tkinter. A case whose import
+    fails (no Tk on the machine, say) is reported as unavailable.
+    """
+    for label, snippet in IMPORT_CASES:
+        code = f"import sys; {snippet}; sys.exit(3 if 'tkinter' in sys.modules else 0)"
+        run = lambda: subprocess.run([sys.executable, "-c", code], capture_output=True)
+        status = run().returncode
+        if status not in (0, 3):
+            print(f"  import       {label:<18} unavailable")
+            continue
+        seconds = best_time(run, repeat)
+        print(f"  import       {label:<18} {seconds * 1e3:9.2f} ms  tkinter={'yes' if status == 3 else 'no'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tessellation engine benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="corpus sizes in characters (default: 1 KB and 3 KB; e.g. --sizes 1000000 "
+                             "10000000 --time-budget 30 for large files)")
+    parser.add_argument("--engines", nargs="+", choices=sorted(ENGINES), default=sorted(ENGINES))
+    parser.add_argument("--corpora", nargs="+", choices=sorted(CORPORA), default=sorted(CORPORA),
+                        help="synthetic corpora for the phases suite (default: all)")
+    parser.add_argument("--format", choices=("text", "binary"), default="binary",
+                        help="blueprint format of the phases suite (default: binary)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case; the best is kept")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="candidate scan budget in seconds for the phases suite (default: none)")
+    parser.add_argument("--output", default=None, help="write the phases suite's results to this JSON file")
+    parser.add_argument("--baseline", default=None,
+                        help="a previous --output report; exit 1 if any case regressed against it")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="growth tolerated against the baseline, as a fraction (default: 0.25)")
+    parser.add_argument("--suites", nargs="+", choices=("phases", "reconstruct", "import", "parity"),
+                        default=["phases", "import", "parity"],
+                        help="benchmarks to run (default: phases, import and parity)")
+    args = parser.parse_args()
+    status = 0
+    if "phases" in args.suites:
+        records = bench_phases(args.sizes, args.engines, args.corpora, args.format, args.repeat, args.time_budget)
+        if args.output:
+            write_report(records, args.output)
+        if args.baseline:
+            with open(args.baseline, encoding='utf-8') as f:
+                regressions = find_regressions(records, json.load(f), args.threshold)
+            for regression in regressions:
+                print(f"  REGRESSION   {regression}")
+            status = 1 if regressions else 0
+    if "reconstruct" in args.suites:
+        bench_reconstruct(args.sizes, args.engines, args.repeat)
+    if "import" in args.suites:
+        bench_import(args.repeat)
+    if "parity" in args.suites:
+        check_parity([size for size in args.sizes if size <= 100_000], args.engines)
+    sys.exit(status)
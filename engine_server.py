@@ -1,88 +1,46 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-import numpy as np
-import math
 import json
+import time
+import base64
+import gzip
+import zlib
+import os
+import threading
+import uuid
+import numpy as np
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from tessellation_core import encode_text, decode_codes
+from tessellation_cache import ResultCache, cache_key, text_digest
+from VectorialTessellation import VectorialTessellator
+from VolumetricTessellation import VolumetricTessellator
 
 # --- Analysis Engines ---
-# (Adapted from the previous Python implementations)
-
-class VolumetricTessellator:
-    def __init__(self, text: str, update_callback=None):
-        self.original_text = text
-        self.length = len(text)
-        self.claimed_positions = np.zeros(self.length, dtype=bool)
-        self.log = update_callback or print
-
-    def _get_volume_permutations(self):
-        permutations = set()
-        for pages in range(1, int(self.length**0.5) + 1):
-            if self.length % pages == 0:
-                area = self.length // pages
-                for rows in range(1, int(area**0.5) + 1):
-                    if area % rows == 0:
-                        cols = area // rows
-                        permutations.add(tuple(sorted((pages, rows, cols))))
-        if not permutations: permutations.add((1, 1, self.length))
-        return sorted(list(permutations), key=lambda x: x[0]*x[1]*x[2])[:50]
-
-    def _find_line_candidates_in_volume(self, volume, char_to_find):
-        candidates = []
-        pages, rows, cols = volume.shape
-        char_locations = np.argwhere(volume == char_to_find)
-        if len(char_locations) < 2: return []
-
-        checked_pairs = set()
-        for i in range(len(char_locations)):
-            for j in range(i + 1, len(char_locations)):
-                p1, p2 = char_locations[i], char_locations[j]
-                pair_key = tuple(sorted((tuple(p1), tuple(p2))))
-                if pair_key in checked_pairs: continue
-                checked_pairs.add(pair_key)
-
-                dp, dr, dc = p2[0] - p1[0], p2[1] - p1[1], p2[2] - p1[2]
-                line_points = [p_other for p_other in char_locations if (p_other[0] - p1[0]) * dr == (p_other[1] - p1[1]) * dp and (p_other[0] - p1[0]) * dc == (p_other[2] - p1[2]) * dp]
-                
-                if len(line_points) > 2:
-                    line_points = sorted([tuple(p) for p in line_points])
-                    start, end = line_points[0], line_points[-1]
-                    desc = f"({char_to_find},{pages},{rows},{cols},{','.join(map(str, start))},{','.join(map(str, end))})"
-                    savings = len(line_points) - len(desc)
-                    if savings > 0:
-                        candidates.append({'savings': savings, 'points': line_points, 'desc': desc})
-        return candidates
-
-    def generate_blueprint(self):
-        all_candidates, unique_chars = [], set(self.original_text)
-        permutations = self._get_volume_permutations()
-
-        for char_to_find in unique_chars:
-            for dims in permutations:
-                pages, rows, cols = dims
-                if pages * rows * cols != self.length: continue
-                volume = np.array(list(self.original_text)).reshape(dims)
-                all_candidates.extend(self._find_line_candidates_in_volume(volume, char_to_find))
-
-        unique_candidates = {cand['desc']: cand for cand in all_candidates}.values()
-        unique_candidates = sorted(list(unique_candidates), key=lambda x: x['savings'], reverse=True)
-        
-        cosmological_key = []
-        for cand in unique_candidates:
-            dims = tuple(map(int, cand['desc'].strip('()').split(',')[1:4]))
-            pages, rows, cols = dims
-            indices_to_claim = [p*rows*cols + r*cols + c for p, r, c in cand['points']]
-            if all(not self.claimed_positions[idx] for idx in indices_to_claim):
-                cosmological_key.append(cand['desc'])
-                for idx in indices_to_claim: self.claimed_positions[idx] = True
-        
-        remnant_stream = "".join([char for i, char in enumerate(self.original_text) if not self.claimed_positions[i]])
-        key_string = "§".join(cosmological_key)
-        compiled_blueprint = f"{self.length}¬{key_string}‡{remnant_stream}"
-        
-        return {
-            'engine': 'volumetric', 'compiledBlueprint': compiled_blueprint,
-            'key': cosmological_key, 'remnant': remnant_stream, 'originalText': self.original_text
-        }
+# The tessellators are the library engines themselves, so the server runs the
+# same optimized candidate search and compiles the same blueprints as the CLI.
+ENGINES = {'vectorial': VectorialTessellator, 'volumetric': VolumetricTessellator}
+
+
+def tessellate(engine_type, text, options, update_callback=None, checkpoint=None):
+    """
+    Runs a library tessellator and shapes its blueprint into an /analyze
+    result. A binary blueprint stays bytes and the remnant is kept as the
+    claimed positions, bit-packed; render_result builds their JSON forms
+    only for the responses that ask for them.
+    """
+    options = dict(options)
+    format = options.pop('format', 'text')
+    tessellator = ENGINES[engine_type](text, update_callback=update_callback, checkpoint=checkpoint, **options)
+    compiled_blueprint = tessellator.generate_blueprint(format)
+    stats = tessellator.search_stats
+    return {
+        'engine': engine_type, 'format': format, 'compiledBlueprint': compiled_blueprint,
+        'key': tessellator.key, '_text': text, '_claimed': np.packbits(tessellator.claimed_positions),
+        'searchCoverage': {'shards': stats['shards'] - stats['shards_pruned'],
+                           'shardsScanned': stats['shards_scanned'], 'complete': stats['complete']},
+        'stats': tessellator.stats.as_dict()
+    }
 
 class HolographicEngine:
     # A simplified placeholder for the holographic engine logic.
@@ -100,32 +58,573 @@ class HolographicEngine:
         }
 
 
+# --- Jobs ---
+# Long analyses run as background jobs on a bounded pool: at most JOB_WORKERS
+# run at once and JOB_QUEUE_DEPTH more may wait; beyond that POST /jobs is
+# refused. Finished jobs are kept for JOB_RETENTION seconds, MAX_FINISHED_JOBS at most.
+JOB_WORKERS = 2
+JOB_QUEUE_DEPTH = 8
+JOB_RETENTION = 600
+MAX_FINISHED_JOBS = 256
+# Seconds between SSE keep-alive comments while a job is quiet.
+SSE_KEEPALIVE = 15
+
+
+class JobCancelled(Exception):
+    """Raised from a job's progress callback once the job has been cancelled."""
+
+
+class Job:
+    """
+    One background analysis: its status, the engine's progress messages in
+    order, and the result or error once it finishes. Cancellation is
+    cooperative: the engine's next checkpoint (polled between step chunks of
+    the scan) or progress callback raises JobCancelled, which unwinds it.
+    """
+
+    def __init__(self, engine_type, text, options):
+        self.id = uuid.uuid4().hex
+        self.engine_type, self.text, self.options = engine_type, text, options
+        self.status = 'queued'
+        self.messages = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.cancel_requested = threading.Event()
+        self.changed = threading.Condition()
+        self.future = None
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed', 'cancelled')
+
+    def checkpoint(self):
+        """The engine's checkpoint: raises JobCancelled once the job has been cancelled."""
+        if self.cancel_requested.is_set():
+            raise JobCancelled()
+
+    def progress(self, message):
+        """The engine's update callback: records the message and honours cancellation."""
+        self.checkpoint()
+        with self.changed:
+            self.messages.append(message)
+            self.changed.notify_all()
+
+    def _finish(self, status, result=None, error=None):
+        with self.changed:
+            self.status, self.result, self.error = status, result, error
+            self.finished = time.time()
+            self.changed.notify_all()
+
+    def run(self):
+        if self.cancel_requested.is_set():
+            return self._finish('cancelled')
+        with self.changed:
+            self.status = 'running'
+            self.changed.notify_all()
+        try:
+            result = run_analysis(self.engine_type, self.text, self.options, update_callback=self.progress,
+                                  checkpoint=self.checkpoint)
+        except JobCancelled:
+            self._finish('cancelled')
+        except Exception as e:
+            self._finish('failed', error=f'An error occurred during analysis: {str(e)}')
+        else:
+            self._finish('done', result=result)
+
+    def describe(self, fields=None):
+        summary = {'id': self.id, 'status': self.status, 'engine': self.engine_type,
+                   'progress': self.messages[-1].strip() if self.messages else None,
+                   'messages': len(self.messages)}
+        if self.status == 'done':
+            summary['result'] = render_result(self.result, fields)
+        if self.error:
+            summary['error'] = self.error
+        return summary
+
+
+class JobQueueFull(Exception):
+    """Raised by JobManager.submit when the pool and its queue are both full."""
+
+
+class JobManager:
+    """Runs jobs on a bounded thread pool and keeps them addressable by id."""
+
+    def __init__(self, workers=JOB_WORKERS, queue_depth=JOB_QUEUE_DEPTH):
+        self.capacity = workers + queue_depth
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tessellation-job')
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job.done]
+        expired = {job.id for job in finished if time.time() - job.finished > JOB_RETENTION}
+        expired.update(job.id for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)])
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def submit(self, engine_type, text, options):
+        with self.lock:
+            self._prune()
+            if sum(1 for job in self.jobs.values() if not job.done) >= self.capacity:
+                raise JobQueueFull()
+            job = Job(engine_type, text, options)
+            self.jobs[job.id] = job
+            job.future = self.executor.submit(job.run)
+        return job
+
+    def counts(self):
+        """Number of jobs waiting in the queue and running right now."""
+        with self.lock:
+            statuses = Counter(job.status for job in self.jobs.values())
+        return statuses['queued'], statuses['running']
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Asks a job to stop; a job still waiting in the queue never starts."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_requested.set()
+        if job.future.cancel():
+            job._finish('cancelled')
+        return job
+
+
+jobs = JobManager()
+
+
+def parse_analysis_request(data):
+    """Validates an /analyze or /jobs body into (engine_type, text, options); raises ValueError."""
+    if not isinstance(data, dict) or 'text' not in data or 'engine' not in data:
+        raise ValueError('Invalid request. Missing text or engine type.')
+    if not isinstance(data['text'], str):
+        raise ValueError('Invalid request. text must be a string.')
+    engine_type = data['engine']
+    if engine_type not in ENGINES and engine_type != 'holographic':
+        raise ValueError('Unknown engine type.')
+    options = {}
+    for key, kind in (('time_budget', (int, float)), ('max_candidates', int)):
+        value = data.get(key)
+        if value is not None:
+            if isinstance(value, bool) or not isinstance(value, kind) or value < 0:
+                raise ValueError(f'Invalid request. {key} must be a non-negative number.')
+            options[key] = value
+    options['format'] = data.get('format', 'text')
+    if options['format'] not in ('text', 'binary'):
+        raise ValueError("Invalid request. format must be 'text' or 'binary'.")
+    return engine_type, data['text'], options
+
+
+# Every field an analysis result may carry, tessellator and holographic alike.
+RESULT_FIELDS = ('engine', 'format', 'compiledBlueprint', 'key', 'remnant', 'originalText', 'searchCoverage',
+                 'stats', 'resonances', 'motifs', 'numericals', 'huffmanDict', 'encodedRemnant', 'error')
+# Named response shapes for the `fields` option; None keeps every field.
+RESPONSE_SHAPES = {
+    'full': None,
+    'lean': ('engine', 'format', 'compiledBlueprint', 'searchCoverage'),
+    'blueprint': ('compiledBlueprint',),
+}
+
+
+def parse_fields(value):
+    """
+    Validates a `fields` option: a shape name from RESPONSE_SHAPES, a list of
+    result field names, or a comma-separated string of them. Raises ValueError.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        if value in RESPONSE_SHAPES:
+            return RESPONSE_SHAPES[value]
+        value = [name for name in value.split(',') if name]
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        raise ValueError(f"Invalid request. fields must be one of {sorted(RESPONSE_SHAPES)} or a list of field names.")
+    unknown = [name for name in value if name not in RESULT_FIELDS]
+    if unknown:
+        raise ValueError(f"Invalid request. Unknown fields {unknown}; known fields are {list(RESULT_FIELDS)}.")
+    return tuple(value)
+
+
+def render_result(result, fields=None):
+    """
+    The JSON form of a result restricted to `fields` (all of it for None;
+    errors are always kept): a binary blueprint base64-encoded, and the
+    remnant and original text rebuilt only if they are asked for.
+    """
+    if result is None:
+        return None
+    wanted = lambda name: fields is None or name in fields or name == 'error'
+    rendered = {name: value for name, value in result.items() if not name.startswith('_') and wanted(name)}
+    if '_claimed' in result:
+        if wanted('remnant'):
+            codes = encode_text(result['_text'])
+            claimed = np.unpackbits(result['_claimed'], count=len(codes)).astype(bool)
+            rendered['remnant'] = decode_codes(codes[~claimed])
+        if wanted('originalText'):
+            rendered['originalText'] = result['_text']
+    if isinstance(rendered.get('compiledBlueprint'), bytes):
+        rendered['compiledBlueprint'] = base64.b64encode(rendered['compiledBlueprint']).decode('ascii')
+    return rendered
+
+
+# Results of /analyze and /jobs by a hash of (engine, text, options). A result
+# holds its whole text, so memory is bounded by bytes (TESSELLATION_CACHE_MEMORY_BYTES)
+# as well as entries. Set TESSELLATION_CACHE_DIR to keep them on disk too,
+# TESSELLATION_CACHE_BYTES to bound it.
+results_cache = ResultCache(max_entries=256, directory=os.environ.get('TESSELLATION_CACHE_DIR'),
+                            max_bytes=int(os.environ.get('TESSELLATION_CACHE_BYTES', 1 << 30)),
+                            max_memory_bytes=int(os.environ.get('TESSELLATION_CACHE_MEMORY_BYTES', 256 << 20)))
+
+
+def run_analysis(engine_type, text, options, update_callback=None, checkpoint=None):
+    """Runs one validated analysis, or serves it from the results cache, and returns its result dict."""
+    log = update_callback or (lambda message: None)
+    # Tagged 'result' since blueprints are kept as bytes, apart from older base64 entries on disk.
+    key = cache_key('result', engine_type, text_digest(encode_text(text)), options)
+    result = results_cache.get(key)
+    if result is not None:
+        log("Served from the results cache.")
+        return result
+    if engine_type in ENGINES:
+        result = tessellate(engine_type, text, options, update_callback=log, checkpoint=checkpoint)
+    else:
+        result = HolographicEngine().generate_blueprint(text)
+    if 'stats' in result:
+        metrics.observe_analysis(engine_type, result['stats'])
+    results_cache.put(key, result)
+    return result
+
+
+# --- Metrics ---
+# Upper bounds, in seconds, of the request latency histogram's buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+# Shards exported by scan time; the rest are only kept to rank them.
+HOT_SHARDS = 20
+MAX_TRACKED_SHARDS = 4096
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    """A Prometheus label set, values escaped: {name="value",...}."""
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+class Metrics:
+    """
+    Process-wide counters for GET /metrics, rendered in the Prometheus text
+    format: request latency histograms, engine phase times and counters
+    summed over every fresh analysis, and the hottest (char, shape) shards.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = {}
+        self.requests = Counter()
+        self.phases = Counter()
+        self.totals = Counter()
+        self.analyses = Counter()
+        self.shards = Counter()
+
+    def observe_request(self, endpoint, method, status, seconds):
+        with self.lock:
+            self.requests[endpoint, method, status] += 1
+            buckets = self.latency.setdefault(endpoint, [0] * len(LATENCY_BUCKETS) + [0.0, 0])
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+            buckets[-2] += seconds
+            buckets[-1] += 1
+
+    def observe_analysis(self, engine, stats):
+        """Adds one analysis's EngineStats.as_dict() to the running totals."""
+        with self.lock:
+            self.analyses[engine] += 1
+            for phase, seconds in stats['phases'].items():
+                self.phases[engine, phase] += seconds
+            for name, value in stats['totals'].items():
+                self.totals[engine, name] += value
+            for row in stats['shards']:
+                self.shards[engine, row['char'], 'x'.join(map(str, row['shape']))] += row['seconds']
+            if len(self.shards) > MAX_TRACKED_SHARDS:
+                self.shards = Counter(dict(self.shards.most_common(MAX_TRACKED_SHARDS // 2)))
+
+    def render(self, queued, running, cache_stats):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+        with self.lock:
+            metric('tessellation_requests_total', 'counter', 'HTTP requests by endpoint, method and status.',
+                   [(_labels(endpoint=e, method=m, status=s), n) for (e, m, s), n in sorted(self.requests.items())])
+            lines.append("# HELP tessellation_request_duration_seconds HTTP request latency by endpoint.")
+            lines.append("# TYPE tessellation_request_duration_seconds histogram")
+            for endpoint, buckets in sorted(self.latency.items()):
+                for bound, count in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f"tessellation_request_duration_seconds_bucket{_labels(endpoint=endpoint, le=bound)} {count}")
+                lines.append(f"tessellation_request_duration_seconds_bucket{_labels(endpoint=endpoint, le='+Inf')} {buckets[-1]}")
+                lines.append(f"tessellation_request_duration_seconds_sum{_labels(endpoint=endpoint)} {buckets[-2]}")
+                lines.append(f"tessellation_request_duration_seconds_count{_labels(endpoint=endpoint)} {buckets[-1]}")
+            metric('tessellation_analyses_total', 'counter', 'Analyses run by an engine, cache hits excluded.',
+                   [(_labels(engine=e), n) for e, n in sorted(self.analyses.items())])
+            metric('tessellation_phase_seconds_total', 'counter', 'Seconds spent in each engine phase.',
+                   [(_labels(engine=e, phase=p), v) for (e, p), v in sorted(self.phases.items())])
+            for name, total, help_text in (
+                    ('tessellation_candidates_found_total', 'candidatesFound', 'Candidate lines found by the scan.'),
+                    ('tessellation_candidates_rejected_total', 'candidatesRejected',
+                     'Candidates dropped as duplicates or overlapped.'),
+                    ('tessellation_positions_claimed_total', 'positionsClaimed',
+                     'Text positions claimed by selected lines.'),
+                    ('tessellation_saved_total', 'saved', 'Characters or bytes saved by selected lines.')):
+                metric(name, 'counter', help_text,
+                       [(_labels(engine=e), v) for (e, n), v in sorted(self.totals.items()) if n == total])
+            metric('tessellation_shard_scan_seconds', 'gauge', f'Scan seconds of the {HOT_SHARDS} hottest shards.',
+                   [(_labels(engine=e, char=c, shape=sh), v) for (e, c, sh), v in self.shards.most_common(HOT_SHARDS)])
+        metric('tessellation_jobs_queued', 'gauge', 'Jobs waiting for a worker.', [('', queued)])
+        metric('tessellation_jobs_in_flight', 'gauge', 'Jobs running now.', [('', running)])
+        metric('tessellation_cache_hits_total', 'counter', 'Results cache hits.', [('', cache_stats['hits'])])
+        metric('tessellation_cache_misses_total', 'counter', 'Results cache misses.', [('', cache_stats['misses'])])
+        if cache_stats['memory_bytes'] is not None:
+            metric('tessellation_cache_memory_bytes', 'gauge', 'Bytes of results held in memory.',
+                   [('', cache_stats['memory_bytes'])])
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
 # --- Flask Server ---
 app = Flask(__name__)
 CORS(app) # Allow cross-origin requests
 
+# Bodies smaller than this are sent as they are; compressing them gains nothing.
+COMPRESS_MIN_BYTES = 1024
+# Chunk size of streamed blueprint bodies.
+STREAM_CHUNK = 1 << 16
+
+
+def negotiate_encoding():
+    """'gzip' or 'deflate' if the client accepts it (gzip preferred), else None."""
+    accepted = {}
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ('gzip', 'deflate'):
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def _compressor(encoding):
+    # HTTP 'deflate' is the zlib format; wbits 31 selects the gzip wrapper.
+    return zlib.compressobj(6, zlib.DEFLATED, 31 if encoding == 'gzip' else 15)
+
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_latency(response):
+    """Feeds the latency histogram; streamed responses count until their headers are ready."""
+    if 'request_started' in g:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe_request(endpoint, request.method, response.status_code,
+                                time.perf_counter() - g.request_started)
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """Compresses buffered responses the client can decode; streamed ones compress themselves."""
+    if (response.is_streamed or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code in (204, 304)):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None or response.content_length is None or response.content_length < COMPRESS_MIN_BYTES:
+        return response
+    data = response.get_data()
+    response.set_data(gzip.compress(data, 6) if encoding == 'gzip' else zlib.compress(data, 6))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def stream_blueprint(result):
+    """
+    Streams a result's blueprint as the raw response body: the binary
+    container as octets, a text blueprint as UTF-8. The body goes out in
+    STREAM_CHUNK pieces, compressed on the fly if the client accepts it.
+    """
+    blueprint = result.get('compiledBlueprint')
+    if blueprint is None:
+        return jsonify({'error': result.get('error', 'This engine produces no blueprint.')}), 422
+    binary = result.get('format') == 'binary'
+    body = memoryview(blueprint if binary else blueprint.encode('utf-8'))
+    encoding = negotiate_encoding()
+
+    def chunks():
+        compressor = _compressor(encoding) if encoding else None
+        for lo in range(0, len(body), STREAM_CHUNK):
+            chunk = body[lo:lo + STREAM_CHUNK]
+            yield compressor.compress(chunk) if compressor else bytes(chunk)
+        if compressor:
+            yield compressor.flush()
+
+    headers = {'Vary': 'Accept-Encoding'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    else:
+        headers['Content-Length'] = str(len(body))
+    return Response(chunks(), headers=headers,
+                    mimetype='application/octet-stream' if binary else 'text/plain; charset=utf-8')
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
     data = request.get_json()
-    if not data or 'text' not in data or 'engine' not in data:
-        return jsonify({'error': 'Invalid request. Missing text or engine type.'}), 400
-    
-    text = data['text']
-    engine_type = data['engine']
+    try:
+        engine_type, text, options = parse_analysis_request(data)
+        fields = parse_fields(request.args.get('fields', data.get('fields')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     try:
-        if engine_type == 'volumetric':
-            engine = VolumetricTessellator(text)
-            result = engine.generate_blueprint()
-        elif engine_type == 'holographic':
-            engine = HolographicEngine()
-            result = engine.generate_blueprint(text)
-        else:
-            return jsonify({'error': 'Unknown engine type.'}), 400
-        
-        return jsonify(result)
+        return jsonify(render_result(run_analysis(engine_type, text, options), fields))
+    except Exception as e:
+        return jsonify({'error': f'An error occurred during analysis: {str(e)}'}), 500
+
+@app.route('/analyze/raw', methods=['POST'])
+def analyze_raw():
+    """
+    The request body is the raw UTF-8 text and the options come from the
+    query string (?engine=volumetric&format=binary&time_budget=2). The
+    response body is the blueprint alone, streamed.
+    """
+    try:
+        # Decoded strictly: a blueprint of U+FFFD-patched text would not rebuild the bytes sent.
+        data = {'text': request.get_data().decode('utf-8'),
+                'engine': request.args.get('engine', 'volumetric'), 'format': request.args.get('format', 'binary')}
+        for key, kind in (('time_budget', float), ('max_candidates', int)):
+            if key in request.args:
+                data[key] = kind(request.args[key])
+        engine_type, text, options = parse_analysis_request(data)
+    except UnicodeDecodeError as e:
+        return jsonify({'error': f'Invalid request. The body is not valid UTF-8 ({e.reason} at byte {e.start}).'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        result = run_analysis(engine_type, text, options)
     except Exception as e:
         return jsonify({'error': f'An error occurred during analysis: {str(e)}'}), 500
+    return stream_blueprint(result)
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    try:
+        engine_type, text, options = parse_analysis_request(request.get_json())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        job = jobs.submit(engine_type, text, options)
+    except JobQueueFull:
+        return jsonify({'error': 'Too many jobs queued. Try again later.'}), 429, {'Retry-After': '5'}
+    return jsonify({'id': job.id, 'status': job.status}), 202, {'Location': f'/jobs/{job.id}'}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job.'}), 404
+    try:
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(job.describe(fields))
+
+@app.route('/jobs/<job_id>/blueprint', methods=['GET'])
+def job_blueprint(job_id):
+    """The finished job's blueprint as a raw, streamed body; 409 while it is not done."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job.'}), 404
+    if job.status != 'done':
+        return jsonify({'id': job.id, 'status': job.status, 'error': 'The job has no result.'}), 409
+    return stream_blueprint(job.result)
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job.'}), 404
+    return jsonify({'id': job.id, 'status': job.status}), 202
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Server-Sent Events: one 'progress' event per engine message, then a final
+    event named after the job's status, carrying the 'lean' result unless
+    ?fields= asks otherwise. Reconnecting clients resume from their Last-Event-ID.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job.'}), 404
+    try:
+        fields = parse_fields(request.args.get('fields', 'lean'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        sent = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        sent = 0
+
+    def stream():
+        nonlocal sent
+        while True:
+            with job.changed:
+                if sent >= len(job.messages) and not job.done:
+                    job.changed.wait(SSE_KEEPALIVE)
+                messages, done = job.messages[sent:], job.done
+            if not messages and not done:
+                yield ": keep-alive\n\n"
+            for message in messages:
+                sent += 1
+                yield f"id: {sent}\nevent: progress\ndata: {json.dumps({'message': message.strip()})}\n\n"
+            if done and sent >= len(job.messages):
+                yield f"event: {job.status}\ndata: {json.dumps(job.describe(fields))}\n\n"
+                return
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    queued, running = jobs.counts()
+    return Response(metrics.render(queued, running, results_cache.stats()),
+                    mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/cache', methods=['GET'])
+def cache_stats():
+    stats = results_cache.stats()
+    return jsonify({'hits': stats['hits'], 'misses': stats['misses'], 'diskHits': stats['disk_hits'],
+                    'evictions': stats['evictions'], 'entries': stats['entries'],
+                    'memoryBytes': stats['memory_bytes'], 'diskBytes': stats['disk_bytes']})
 
 if __name__ == '__main__':
     print("Starting Structural Compression Engine server at http://localhost:5000")
@@ -0,0 +1,497 @@
+import argparse
+import bisect
+import csv
+import glob
+import json
+import io
+import os
+import struct
+import sys
+import tempfile
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tessellation_core import (BLUEPRINT_MAGIC, encode_varints, read_varint, decode_utf8, encode_text,
+                               map_bytes, map_text, paint_codes, unpack_blueprint_codes, write_codes)
+
+# Block container, written front to back so it can be streamed:
+#   BLOCKS_MAGIC, one byte of engine dimensionality (2 or 3), one byte of
+#   blueprint format (0 = text, 1 = binary), varint block size in characters,
+#   the block blueprints back to back (text ones as UTF-8),
+#   the block index: varint block count, then per block the varint byte size
+#   of its blueprint and the varint number of characters it holds,
+#   and an 8-byte little-endian footer with the byte offset of the index.
+BLOCKS_MAGIC = b'VTC\x01'
+_FOOTER = struct.Struct('<Q')
+_FORMAT_CODES = {'text': 0, 'binary': 1}
+
+DEFAULT_BLOCK_SIZE = 1 << 14
+
+
+def _tessellate_block(engine, text: str, fmt: str, options) -> bytes:
+    blueprint = engine(text, update_callback=lambda message: None, **options).generate_blueprint(fmt)
+    return blueprint if fmt == 'binary' else blueprint.encode('utf-8')
+
+
+def _read_blocks(src, block_size: int):
+    """Yields successive blocks of at most `block_size` characters from a text stream."""
+    while True:
+        block = src.read(block_size)
+        if not block:
+            return
+        yield block
+
+
+def _blueprints(engine, blocks, fmt, options, workers):
+    """
+    Tessellates every block, in order. With several workers the blocks go
+    to a process pool, at most two per worker in flight, so memory stays
+    bounded by the window rather than the input.
+    """
+    if workers <= 1:
+        for block in blocks:
+            yield len(block), _tessellate_block(engine, block, fmt, options)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for block in blocks:
+            pending.append((len(block), pool.submit(_tessellate_block, engine, block, fmt, options)))
+            if len(pending) >= 2 * workers:
+                size, future = pending.popleft()
+                yield size, future.result()
+        while pending:
+            size, future = pending.popleft()
+            yield size, future.result()
+
+
+def compress_stream(engine, src, dst, block_size: int = DEFAULT_BLOCK_SIZE, fmt: str = 'binary',
+                    workers: int = 1, update_callback=None, **options) -> int:
+    """
+    Compresses the text stream `src` into the binary stream `dst` as a block
+    container. Every block of `block_size` characters is tessellated on its
+    own by `engine` (a tessellator class, given `options`), so memory and
+    time per block stay bounded however long the input is. Returns the
+    number of blocks written.
+    """
+    if block_size < 1:
+        raise ValueError("Block size must be positive.")
+    if fmt not in _FORMAT_CODES:
+        raise ValueError(f"Unknown blueprint format: {fmt}")
+    log = update_callback or (lambda message: None)
+    # Nested process pools would oversubscribe; blocks are the unit of parallelism.
+    options = dict(options, workers=1)
+    header = BLOCKS_MAGIC + bytes([engine.ndim, _FORMAT_CODES[fmt]]) + encode_varints([block_size])
+    dst.write(header)
+    offset, index = len(header), []
+    for size, blueprint in _blueprints(engine, _read_blocks(src, block_size), fmt, options, workers):
+        dst.write(blueprint)
+        offset += len(blueprint)
+        index.append((len(blueprint), size))
+        log(f"  Block {len(index)}: {size} chars -> {len(blueprint)} bytes")
+    dst.write(encode_varints([len(index)] + [value for entry in index for value in entry]))
+    dst.write(_FOOTER.pack(offset))
+    return len(index)
+
+
+class BlockIndex:
+    """
+    The index of a block container: per block, the byte offset and size of
+    its blueprint and the character offset and length of the text it holds.
+    Reading it touches only the header and the tail of the stream.
+    """
+
+    def __init__(self, src):
+        src.seek(0)
+        header = src.read(len(BLOCKS_MAGIC) + 2 + 10)
+        if header[:len(BLOCKS_MAGIC)] != BLOCKS_MAGIC:
+            raise ValueError("Invalid container format. Expected a tessellation block container.")
+        self.ndim, code = header[len(BLOCKS_MAGIC)], header[len(BLOCKS_MAGIC) + 1]
+        self.format = {value: name for name, value in _FORMAT_CODES.items()}.get(code)
+        if self.format is None:
+            raise ValueError(f"Unknown blueprint format code: {code}")
+        self.block_size, data_start = read_varint(header, len(BLOCKS_MAGIC) + 2)
+
+        end = src.seek(0, io.SEEK_END)
+        if end < _FOOTER.size:
+            raise ValueError("Truncated block container.")
+        src.seek(end - _FOOTER.size)
+        (index_offset,) = _FOOTER.unpack(src.read(_FOOTER.size))
+        src.seek(index_offset)
+        table = src.read(end - _FOOTER.size - index_offset)
+        count, pos = read_varint(table, 0)
+        self.byte_offsets, self.byte_sizes, self.char_offsets, self.char_sizes = [], [], [], []
+        byte_offset, char_offset = data_start, 0
+        for _ in range(count):
+            byte_size, pos = read_varint(table, pos)
+            char_size, pos = read_varint(table, pos)
+            self.byte_offsets.append(byte_offset)
+            self.byte_sizes.append(byte_size)
+            self.char_offsets.append(char_offset)
+            self.char_sizes.append(char_size)
+            byte_offset += byte_size
+            char_offset += char_size
+        self.length = char_offset
+
+    def __len__(self):
+        return len(self.byte_offsets)
+
+    def read_blueprint(self, src, i: int):
+        """Reads the blueprint of block `i`: bytes in binary format, a string in text format."""
+        src.seek(self.byte_offsets[i])
+        blueprint = src.read(self.byte_sizes[i])
+        return blueprint if self.format == 'binary' else blueprint.decode('utf-8')
+
+
+def decompress_stream(reconstruct, src, dst) -> int:
+    """
+    Rebuilds the text of the block container `src` (a seekable binary
+    stream) block by block into the text stream `dst`, using the engine's
+    `reconstruct`. Returns the number of characters written.
+    """
+    index = BlockIndex(src)
+    for i in range(len(index)):
+        dst.write(reconstruct(index.read_blueprint(src, i)))
+    return index.length
+
+
+def extract_stream(extract, src, start: int, end: int) -> str:
+    """
+    Characters [start, end) of the text in the block container `src`: only
+    the blocks overlapping the span are read, and each is decoded with the
+    engine's `extract` for just its share of the span.
+    """
+    index = BlockIndex(src)
+    pieces = []
+    first = bisect.bisect_right(index.char_offsets, start) - 1
+    for i in range(max(first, 0), len(index)):
+        offset = index.char_offsets[i]
+        if offset >= end:
+            break
+        pieces.append(extract(index.read_blueprint(src, i), max(start - offset, 0), end - offset))
+    return "".join(pieces)
+
+
+@contextmanager
+def output_file(path):
+    """
+    The binary stream to write the file `path` through: stdout for '-',
+    else a temporary file beside it that replaces it only once the block
+    exits cleanly. A failed run leaves no partial output and any file
+    already at `path` (the input itself, say) untouched.
+    """
+    if path == '-':
+        yield sys.stdout.buffer
+        sys.stdout.buffer.flush()
+        return
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as dst:
+            yield dst
+        # mkstemp creates the file private; give it the mode a plain open() would.
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp, 0o666 & ~umask)
+        os.replace(temp, path)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+
+def same_file(input_path, output_path) -> bool:
+    """True if the paths (neither of them '-') name one existing file."""
+    return ('-' not in (input_path, output_path) and os.path.exists(input_path) and os.path.exists(output_path)
+            and os.path.samefile(input_path, output_path))
+
+
+def read_codes(path):
+    """Code points of the UTF-8 file at `path`, mapped rather than read; '-' reads stdin."""
+    return decode_utf8(sys.stdin.buffer.read()) if path == '-' else map_text(path)
+
+
+def compress_file(engine, path, dst, fmt: str = 'binary', update_callback=None, **options) -> int:
+    """
+    Tessellates the UTF-8 file at `path` as a single blueprint, written
+    incrementally to the binary stream `dst`. The file goes into the engine
+    as a code-point array, never as a Python string. Returns its length.
+    """
+    codes = read_codes(path)
+    engine(codes, update_callback=update_callback or (lambda message: None), **options).write_blueprint(dst, fmt)
+    return len(codes)
+
+
+def decompress_file(path, dst, engine=None) -> int:
+    """
+    Rebuilds the text of the blueprint or block container at `path` ('-'
+    for stdin) into the binary stream `dst` as UTF-8. Binary blueprints name
+    their engine; text ones are read with `engine`. Returns the number of
+    characters written.
+    """
+    data = sys.stdin.buffer.read() if path == '-' else map_bytes(path)
+    if bytes(data[:len(BLOCKS_MAGIC)]) == BLOCKS_MAGIC:
+        text = io.TextIOWrapper(dst, encoding='utf-8', newline='', write_through=True)
+        with io.BytesIO(data) if path == '-' else open(path, 'rb') as src:
+            ndim = BlockIndex(src).ndim
+            try:
+                return decompress_stream(_engine('volumetric' if ndim == 3 else 'vectorial').reconstruct, src, text)
+            finally:
+                text.detach()
+    if bytes(data[:len(BLUEPRINT_MAGIC)]) == BLUEPRINT_MAGIC:
+        codes = paint_codes(*unpack_blueprint_codes(data)[1:])
+    else:
+        codes = encode_text((engine or _engine('vectorial')).reconstruct(bytes(data).decode('utf-8')))
+    write_codes(dst, codes)
+    return len(codes)
+
+
+# Suffixes batch mode gives blueprints written next to their sources.
+BATCH_SUFFIXES = {'binary': '.vtb', 'text': '.vtt'}
+REPORT_FIELDS = ('file', 'output', 'input_bytes', 'output_bytes', 'ratio', 'seconds', 'lossless', 'error')
+
+
+def batch_paths(inputs, command: str):
+    """
+    Expands directories and glob patterns into a sorted list of files.
+    Directories contribute their regular files; blueprints are skipped when
+    compressing and only blueprints are kept when decompressing.
+    """
+    found = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*')
+        found.update(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+    is_blueprint = lambda path: os.path.splitext(path)[1] in BATCH_SUFFIXES.values()
+    return sorted(path for path in found if is_blueprint(path) == (command == 'decompress'))
+
+
+def batch_output(path: str, command: str, fmt: str = 'binary') -> str:
+    """Where batch mode writes the result for `path`: side by side, the suffix added or removed."""
+    if command == 'compress':
+        return path + BATCH_SUFFIXES[fmt]
+    return os.path.splitext(path)[0]
+
+
+def _batch_init():
+    # Pays the engine imports once per pool process rather than once per file.
+    _engine('vectorial'), _engine('volumetric')
+
+
+def _batch_job(name: str, command: str, path: str, output: str, fmt: str, verify: bool, force: bool,
+               options) -> dict:
+    """Compresses or decompresses one file for run_batch and returns its report row."""
+    row = dict.fromkeys(REPORT_FIELDS, '')
+    row.update(file=path, output=output)
+    # Decompressing next to a blueprint lands on its source; never replace a file unasked.
+    if not force and os.path.exists(output):
+        row['error'] = f"FileExistsError: {output} already exists (use --force to overwrite)"
+        return row
+    started = time.perf_counter()
+    try:
+        with output_file(output) as dst:
+            if command == 'compress':
+                compress_file(_engine(name), path, dst, fmt, **options)
+            else:
+                decompress_file(path, dst, _engine(name))
+        row['seconds'] = round(time.perf_counter() - started, 6)
+        row['input_bytes'], row['output_bytes'] = os.path.getsize(path), os.path.getsize(output)
+        row['ratio'] = round(row['output_bytes'] / row['input_bytes'], 6) if row['input_bytes'] else ''
+        if verify and command == 'compress':
+            rebuilt = io.BytesIO()
+            decompress_file(output, rebuilt, _engine(name))
+            row['lossless'] = rebuilt.getvalue() == bytes(map_bytes(path))
+    except (OSError, ValueError) as error:
+        row['seconds'] = round(time.perf_counter() - started, 6)
+        row['error'] = f"{type(error).__name__}: {error}"
+    return row
+
+
+def run_batch(name: str, command: str, paths, fmt: str = 'binary', workers: int = 1, verify: bool = True,
+              update_callback=None, force: bool = False, **options):
+    """
+    Compresses (or decompresses) every file in `paths` next to itself with
+    the engine called `name`, through one process pool that lives for the
+    whole batch. With `verify`, each blueprint is decompressed again and
+    compared with its source. Outputs that already exist are reported as
+    errors and left alone unless `force`. Returns the report rows in input order.
+    """
+    log = update_callback or (lambda message: None)
+    jobs = [(name, command, path, batch_output(path, command, fmt), fmt, verify, force, dict(options, workers=1))
+            for path in paths]
+    rows = [None] * len(jobs)
+    if workers <= 1:
+        for i, job in enumerate(jobs):
+            rows[i] = _batch_job(*job)
+            log(f"  [{i + 1}/{len(jobs)}] {rows[i]['file']}")
+        return rows
+    with ProcessPoolExecutor(max_workers=workers, initializer=_batch_init) as pool:
+        futures = {pool.submit(_batch_job, *job): i for i, job in enumerate(jobs)}
+        for done, future in enumerate(as_completed(futures), 1):
+            rows[futures[future]] = future.result()
+            log(f"  [{done}/{len(jobs)}] {rows[futures[future]]['file']}")
+    return rows
+
+
+def write_report(rows, dst, report_format: str = 'csv'):
+    """Writes batch report rows to the text stream `dst` as CSV or as a JSON list."""
+    if report_format == 'json':
+        json.dump(rows, dst, indent=2)
+        dst.write("\n")
+    else:
+        writer = csv.DictWriter(dst, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+FILE_COMMANDS = ('compress', 'decompress', 'batch')
+
+
+def file_cli(engine, argv):
+    """
+    The `compress IN OUT` / `decompress IN OUT` entry points of an engine's
+    command line: one blueprint per file, '-' for stdin or stdout. Nothing
+    is echoed unless --verbose, which logs progress to stderr. `batch`
+    runs either command over directories or globs and prints a report.
+    """
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]),
+                                     description=f"{engine.__name__} file compression")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compress = commands.add_parser("compress", help="compress a UTF-8 text file into a blueprint")
+    compress.add_argument("input", help="text file to compress ('-' for stdin)")
+    compress.add_argument("output", help="blueprint file to write ('-' for stdout)")
+    compress.add_argument("--format", choices=tuple(_FORMAT_CODES), default="binary",
+                          help="blueprint encoding (default: binary)")
+    compress.add_argument("--workers", type=int, default=1,
+                          help="processes for the candidate scan (0 = one per CPU, default: 1)")
+    compress.add_argument("--time-budget", type=float, default=None,
+                          help="seconds to spend scanning before selecting from what was found")
+    compress.add_argument("--max-candidates", type=int, default=None,
+                          help="stop scanning once this many lines are found")
+    decompress = commands.add_parser("decompress", help="rebuild the text of a blueprint or block container")
+    decompress.add_argument("input", help="blueprint or block container to read")
+    decompress.add_argument("output", help="text file to write ('-' for stdout)")
+    batch = commands.add_parser("batch", help="compress or decompress many files side by side")
+    batch.add_argument("action", choices=("compress", "decompress"))
+    batch.add_argument("inputs", nargs="+", help="files, directories or glob patterns ('**' recurses)")
+    batch.add_argument("--format", choices=tuple(_FORMAT_CODES), default="binary",
+                       help=f"blueprint encoding, written with suffix {BATCH_SUFFIXES} (default: binary)")
+    batch.add_argument("--workers", type=int, default=0,
+                       help="processes in the pool, one file each at a time (0 = one per CPU, default: 0)")
+    batch.add_argument("--time-budget", type=float, default=None,
+                       help="seconds each file may spend scanning")
+    batch.add_argument("--max-candidates", type=int, default=None,
+                       help="stop scanning a file once this many lines are found")
+    batch.add_argument("--no-verify", dest="verify", action="store_false",
+                       help="skip decompressing each blueprint again to check it is lossless")
+    batch.add_argument("--report", default="-", help="report file, CSV or .json (default: CSV on stdout)")
+    batch.add_argument("--force", action="store_true",
+                       help="overwrite outputs that already exist (by default they are reported as errors)")
+    for command in (compress, decompress, batch):
+        command.add_argument("-v", "--verbose", action="store_true", help="log progress to stderr")
+    args = parser.parse_args(argv)
+    log = (lambda message: print(message, file=sys.stderr)) if args.verbose else (lambda message: None)
+
+    if args.command == "batch":
+        paths = batch_paths(args.inputs, args.action)
+        log(f"Batch {args.action}: {len(paths)} files")
+        rows = run_batch('volumetric' if engine.ndim == 3 else 'vectorial', args.action, paths, args.format,
+                         args.workers or os.cpu_count(), args.verify, update_callback=log, force=args.force,
+                         time_budget=args.time_budget, max_candidates=args.max_candidates)
+        report = sys.stdout if args.report == '-' else open(args.report, 'w', newline='')
+        try:
+            write_report(rows, report, 'json' if args.report.endswith('.json') else 'csv')
+        finally:
+            if report is not sys.stdout:
+                report.close()
+        failed = sum(1 for row in rows if row['error'] or row['lossless'] is False)
+        log(f"Done: {len(rows) - failed} ok, {failed} failed")
+        return 1 if failed else 0
+
+    try:
+        if same_file(args.input, args.output):
+            raise ValueError(f"{args.output} is the input file")
+        # OUT only appears, whole, once the run succeeds; a failed one leaves no partial file.
+        with output_file(args.output) as dst:
+            if args.command == "compress":
+                length = compress_file(engine, args.input, dst, args.format, update_callback=log,
+                                       workers=args.workers or os.cpu_count(), time_budget=args.time_budget,
+                                       max_candidates=args.max_candidates)
+            else:
+                length = decompress_file(args.input, dst, engine)
+    except (OSError, ValueError) as error:
+        # Reported like a batch row's error.
+        print(f"{parser.prog} {args.command}: {type(error).__name__}: {error}", file=sys.stderr)
+        return 1
+    log(f"Compressed {length} chars into {args.output}" if args.command == "compress"
+        else f"Rebuilt {length} chars into {args.output}")
+
+
+def _engine(name):
+    # Imported on demand so that only the engine in use is loaded.
+    if name == 'volumetric':
+        from VolumetricTessellation import VolumetricTessellator
+        return VolumetricTessellator
+    from VectorialTessellation import VectorialTessellator
+    return VectorialTessellator
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Block-chunked tessellation of large files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compress = commands.add_parser("compress", help="compress a text file into a block container")
+    compress.add_argument("input", help="text file to compress ('-' for stdin)")
+    compress.add_argument("output", help="container to write")
+    compress.add_argument("--engine", choices=("vectorial", "volumetric"), default="vectorial")
+    compress.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE,
+                          help=f"characters per block (default: {DEFAULT_BLOCK_SIZE})")
+    compress.add_argument("--format", choices=tuple(_FORMAT_CODES), default="binary",
+                          help="blueprint encoding of every block (default: binary)")
+    compress.add_argument("--workers", type=int, default=1,
+                          help="processes tessellating blocks (0 = one per CPU, default: 1)")
+    compress.add_argument("--time-budget", type=float, default=None,
+                          help="seconds each block may spend scanning")
+    decompress = commands.add_parser("decompress", help="rebuild the text of a block container")
+    decompress.add_argument("input", help="container to read")
+    decompress.add_argument("output", help="text file to write ('-' for stdout)")
+    extract = commands.add_parser("extract", help="print characters [start, end) of a container or blueprint")
+    extract.add_argument("input", help="block container or blueprint file to read")
+    extract.add_argument("start", type=int)
+    extract.add_argument("end", type=int)
+    extract.add_argument("--engine", choices=("vectorial", "volumetric"), default="vectorial",
+                         help="engine that wrote a text blueprint (binary ones say so themselves)")
+    args = parser.parse_args()
+
+    if args.command in ("compress", "decompress") and same_file(args.input, args.output):
+        parser.error(f"{args.output} is the input file")
+    if args.command == "compress":
+        # stdin is read like a file: as UTF-8 and with its line endings untouched.
+        src = (io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='') if args.input == '-'
+               else open(args.input, 'r', encoding='utf-8', newline=''))
+        with src, output_file(args.output) as dst:
+            blocks = compress_stream(_engine(args.engine), src, dst, args.block_size, args.format,
+                                     args.workers or os.cpu_count(), update_callback=print,
+                                     time_budget=args.time_budget)
+        print(f"Wrote {blocks} blocks to {args.output}")
+    elif args.command == "extract":
+        with open(args.input, 'rb') as src:
+            magic = src.read(len(BLOCKS_MAGIC))
+            if magic == BLOCKS_MAGIC:
+                ndim = BlockIndex(src).ndim
+                engine = _engine('volumetric' if ndim == 3 else 'vectorial')
+                sys.stdout.write(extract_stream(engine.extract, src, args.start, args.end))
+            else:
+                src.seek(0)
+                blueprint = src.read()
+                if blueprint.startswith(BLUEPRINT_MAGIC):
+                    ndim = blueprint[len(BLUEPRINT_MAGIC) + 1]
+                    engine = _engine('volumetric' if ndim == 3 else 'vectorial')
+                else:
+                    blueprint, engine = blueprint.decode('utf-8'), _engine(args.engine)
+                sys.stdout.write(engine.extract(blueprint, args.start, args.end))
+    else:
+        with open(args.input, 'rb') as src:
+            ndim = BlockIndex(src).ndim
+            with output_file(args.output) as out:
+                dst = sys.stdout if args.output == '-' else io.TextIOWrapper(out, encoding='utf-8', newline='')
+                decompress_stream(_engine('volumetric' if ndim == 3 else 'vectorial').reconstruct, src, dst)
+                dst.flush()
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Code points hashed per update, so digesting a large text stays bounded in memory.
+_DIGEST_CHUNK = 1 << 20
+
+
+def text_digest(codes: np.ndarray) -> str:
+    """
+    SHA-256 of a text's code points. Codes are widened to 32 bits first, so
+    the digest is the same whichever compact dtype the text was encoded in.
+    """
+    digest = hashlib.sha256()
+    for lo in range(0, len(codes), _DIGEST_CHUNK):
+        digest.update(np.ascontiguousarray(codes[lo:lo + _DIGEST_CHUNK], dtype='<u4').tobytes())
+    return digest.hexdigest()
+
+
+def cache_key(*parts) -> str:
+    """A content address for `parts` (digests, engine names, option dicts...), as a hex string."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    A two-tier, content-addressed cache: an in-memory LRU of `max_entries`
+    values (and, given `max_memory_bytes`, of at most that many bytes),
+    backed, when `directory` is given, by pickled files there whose total
+    size is kept under `max_bytes` by evicting the least recently used.
+    Values must be picklable, and the directory should only ever be written
+    by this cache, since its files are unpickled on a hit. Safe to share
+    between threads.
+    """
+
+    def __init__(self, max_entries: int = 4096, directory=None, max_bytes: int = 1 << 30,
+                 max_memory_bytes: int = None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.memory = OrderedDict()
+        # Measured size of each value in memory; only kept when memory is bounded by bytes.
+        self.sizes = {}
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.disk_hits = self.evictions = 0
+        self.disk_bytes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.disk_bytes = sum(entry.stat().st_size for entry in os.scandir(directory)
+                                  if entry.name.endswith('.pkl'))
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key, default=None):
+        """The value stored under `key`, from memory or else from disk, or `default`."""
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return self.memory[key]
+        value, size = self._load(key) if self.directory else (None, 0)
+        with self.lock:
+            if value is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, value, size)
+        return value
+
+    def put(self, key, value):
+        """Stores `value` under `key` in memory and, if there is one, on disk."""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL) if self.directory else None
+        size = self._measure(value, data) if self.max_memory_bytes is not None else 0
+        with self.lock:
+            self._remember(key, value, size)
+        if self.directory:
+            self._store(key, data)
+
+    @staticmethod
+    def _measure(value, data=None) -> int:
+        """Bytes `value` takes, near enough: an array's buffer, anything else its pickle."""
+        if isinstance(value, np.ndarray):
+            return value.nbytes
+        return len(data if data is not None else pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def _remember(self, key, value, size=0):
+        self._forget(key)
+        # A value larger than the whole memory tier would only flush it; it stays on disk alone.
+        if self.max_memory_bytes is not None and size > self.max_memory_bytes:
+            return
+        self.memory[key] = value
+        self.sizes[key] = size
+        self.memory_bytes += size
+        while len(self.memory) > self.max_entries or (self.max_memory_bytes is not None
+                                                      and self.memory_bytes > self.max_memory_bytes):
+            self._forget(next(iter(self.memory)))
+
+    def _forget(self, key):
+        if key in self.memory:
+            del self.memory[key]
+            self.memory_bytes -= self.sizes.pop(key)
+
+    def _load(self, key):
+        """The value pickled under `key` and its size on disk, or (None, 0)."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            value = pickle.loads(data)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None, 0
+        # The file's mtime is its last use, which is what eviction orders by.
+        os.utime(path)
+        return value, len(data)
+
+    def _store(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        path = self._path(key)
+        with self.lock:
+            replaced = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp, path)
+            self.disk_bytes += len(data) - replaced
+            if self.disk_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Removes least recently used files until the disk tier fits in max_bytes."""
+        entries = sorted((entry for entry in os.scandir(self.directory) if entry.name.endswith('.pkl')),
+                         key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if self.disk_bytes <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self.disk_bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Hit and miss counters and the current size of each tier."""
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'disk_hits': self.disk_hits,
+                    'evictions': self.evictions, 'entries': len(self.memory),
+                    'memory_bytes': self.memory_bytes if self.max_memory_bytes is not None else None,
+                    'disk_bytes': self.disk_bytes if self.directory else None}
+
+
+def cached_blocks(cache, keys, scan_missing, keep=None):
+    """
+    Yields one candidate block per key, in order: blocks already in `cache`
+    come straight from it, the rest from `scan_missing(indices)`, which is
+    handed only the indices that missed and is stored back as it yields,
+    unless `keep()` says the block just scanned may be incomplete.
+    Closing this generator closes the scan.
+    """
+    blocks = [cache.get(key) for key in keys]
+    results = scan_missing([i for i, block in enumerate(blocks) if block is None])
+    try:
+        for key, block in zip(keys, blocks):
+            if block is None:
+                block = next(results)
+                if keep is None or keep():
+                    cache.put(key, block.copy())
+            # Callers tag blocks in place, so the cached copy is never handed out.
+            yield block.copy()
+    finally:
+        results.close()
+
+
+def blueprint_key(tessellator, fmt: str, options) -> str:
+    """
+    Cache key of a whole blueprint: the engine's text and dimensionality,
+    the format, and the options that shape the search (worker counts,
+    callbacks, checkpoints and profiling do not).
+    """
+    options = {name: value for name, value in options.items()
+               if name not in ('workers', 'cache', 'update_callback', 'checkpoint', 'profile')}
+    return cache_key('blueprint', tessellator.ndim, text_digest(tessellator.codes), fmt, options)
+
+
+def cached_blueprint(tessellator, fmt: str, options):
+    """
+    tessellator.generate_blueprint(fmt), read from the tessellator's cache
+    if it has one and it has seen this text and `options` before, and
+    stored there otherwise.
+    """
+    cache = tessellator.cache
+    if cache is None:
+        return tessellator.generate_blueprint(fmt)
+    key = blueprint_key(tessellator, fmt, options)
+    blueprint = cache.get(key)
+    if blueprint is None:
+        blueprint = tessellator.generate_blueprint(fmt)
+        cache.put(key, blueprint)
+    return blueprint
@@ -0,0 +1,54 @@
+"""
+Headless command line for the tessellation engines. It never imports
+tkinter, so it runs on machines without a display or Tk:
+
+    python -m tessellation_cli compress IN OUT [--engine volumetric] [--format text] [-v]
+    python -m tessellation_cli decompress IN OUT
+    python -m tessellation_cli batch compress DIR_OR_GLOB... [--report report.json]
+    python -m tessellation_cli analyze TEXT... [--engine volumetric] [--format binary]
+
+IN and OUT may be '-' for stdin and stdout. `analyze` is the engines'
+verbose demonstration run on a string given on the command line.
+"""
+import argparse
+import importlib
+import os
+import sys
+
+from tessellation_blocks import FILE_COMMANDS, file_cli
+
+# Engine name -> (module, tessellator class).
+ENGINES = {'vectorial': ('VectorialTessellation', 'VectorialTessellator'),
+           'volumetric': ('VolumetricTessellation', 'VolumetricTessellator')}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(prog="python -m tessellation_cli", add_help=False)
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="vectorial")
+    args, rest = parser.parse_known_args(argv)
+    module = importlib.import_module(ENGINES[args.engine][0])
+    engine = getattr(module, ENGINES[args.engine][1])
+    if rest[:1] and rest[0] in FILE_COMMANDS:
+        return file_cli(engine, rest)
+
+    parser = argparse.ArgumentParser(prog="python -m tessellation_cli", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=FILE_COMMANDS + ('analyze',))
+    parser.add_argument("text", nargs="*", help="string to analyze")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="vectorial")
+    parser.add_argument("--format", choices=module.BLUEPRINT_FORMATS, default="text")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes for the candidate scan (0 = one per CPU, default: 1)")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="seconds to spend scanning before selecting from what was found")
+    args = parser.parse_args(argv)
+    if not args.text:
+        parser.error("analyze needs a string")
+    module.run_cli(" ".join(args.text), args.format, workers=args.workers or os.cpu_count(),
+                   time_budget=args.time_budget)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,996 @@
+import codecs
+import functools
+import io
+import math
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from tessellation_cache import text_digest, cache_key, cached_blocks
+
+# Upper bound on the number of (step, point) cells examined per vectorized pass.
+_CHUNK_CELLS = 1 << 20
+# Characters matching at least 1 in _DENSE_RATIO cells are scanned with whole-grid shifts.
+_DENSE_RATIO = 16
+
+
+def _place_values(shape):
+    """Flat-index weight of each axis for a C-ordered array of the given shape."""
+    place = np.ones(len(shape), dtype=np.int64)
+    for axis in range(len(shape) - 2, -1, -1):
+        place[axis] = place[axis + 1] * shape[axis + 1]
+    return place
+
+
+def _lex_positive_steps(shape, min_points):
+    """
+    Enumerates every step vector whose first non-zero component is positive and
+    which could still fit `min_points` cells inside an array of `shape`.
+    """
+    reach = [(extent - 1) // (min_points - 1) for extent in shape]
+    axes = [np.arange(-r, r + 1, dtype=np.int64) for r in reach]
+    axes[0] = np.arange(0, reach[0] + 1, dtype=np.int64)
+    grid = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, len(shape))
+    nonzero = grid != 0
+    first = np.argmax(nonzero, axis=1)
+    positive = nonzero.any(axis=1) & (grid[np.arange(len(grid)), first] > 0)
+    return grid[positive]
+
+
+def _pair_steps(coords, shape, min_points):
+    """Collects the distinct difference vectors between every ordered pair of points."""
+    k = len(coords)
+    limit = np.array([(extent - 1) // (min_points - 1) for extent in shape], dtype=np.int64)
+    rows = max(1, _CHUNK_CELLS // k)
+    found = []
+    for lo in range(0, k - 1, rows):
+        hi = min(lo + rows, k - 1)
+        diffs = coords[None, :, :] - coords[lo:hi, None, :]
+        # Points come in flat order, so pairs (i, j > i) give lex-positive steps.
+        later = np.arange(k)[None, :] > np.arange(lo, hi)[:, None]
+        diffs = diffs[later]
+        found.append(np.unique(diffs[(np.abs(diffs) <= limit).all(axis=1)], axis=0))
+    return np.unique(np.concatenate(found), axis=0)
+
+
+def _in_bounds(coords, steps, shape, sign):
+    """Tests, per (step, point), whether `coords + sign * step` stays inside `shape`."""
+    valid = np.ones((len(steps), len(coords)), dtype=bool)
+    for axis, extent in enumerate(shape):
+        moved = coords[None, :, axis] + sign * steps[:, axis, None]
+        valid &= (moved >= 0) & (moved < extent)
+    return valid
+
+
+def _shifted_slices(shape, step):
+    """Slices selecting the cells that have a neighbour at +step, and those neighbours."""
+    here = tuple(slice(max(0, -s), extent - max(0, s)) for extent, s in zip(shape, step))
+    there = tuple(slice(max(0, s), extent - max(0, -s)) for extent, s in zip(shape, step))
+    return here, there
+
+
+def _reaches(match, step, times, sign):
+    """Cells from which `times` further cells at `sign * step` intervals all match."""
+    reach = np.ones(match.shape, dtype=bool)
+    for t in range(1, times + 1):
+        here, there = _shifted_slices(match.shape, sign * t * step)
+        shifted = np.zeros(match.shape, dtype=bool)
+        shifted[here] = match[there]
+        reach &= shifted
+    return reach
+
+
+def _dense_run_bounds(match, steps, min_points):
+    """Locates run starts and ends for each step with shifted whole-grid comparisons."""
+    start_steps, start_cells, end_cells = [], [], []
+    for i, step in enumerate(steps):
+        here, there = _shifted_slices(match.shape, step)
+        linked = match[here] & match[there]
+        has_next = np.zeros(match.shape, dtype=bool)
+        has_prev = np.zeros(match.shape, dtype=bool)
+        has_next[here] = linked
+        has_prev[there] = linked
+        # Runs shorter than min_points are dropped before their ends are paired.
+        starts = has_next & ~has_prev & _reaches(match, step, min_points - 2, 1)
+        if starts.any():
+            start_cells.append(np.flatnonzero(starts))
+            ends = has_prev & ~has_next & _reaches(match, step, min_points - 2, -1)
+            end_cells.append(np.flatnonzero(ends))
+            start_steps.append(np.full(len(start_cells[-1]), i, dtype=np.int64))
+    if not start_cells:
+        return None
+    step_idx = np.concatenate(start_steps)
+    return step_idx, np.concatenate(start_cells), step_idx, np.concatenate(end_cells)
+
+
+def _sparse_run_bounds(match, positions, coords, steps, place):
+    """Locates run starts and ends for each step by gathering at the matching cells only."""
+    shape = match.shape
+    flat = match.reshape(-1)
+    offsets = steps @ place
+    valid = _in_bounds(coords, steps, shape, -1)
+    has_prev = valid & flat[np.where(valid, positions[None, :] - offsets[:, None], 0)]
+    valid = _in_bounds(coords, steps, shape, 1)
+    has_next = valid & flat[np.where(valid, positions[None, :] + offsets[:, None], 0)]
+    start_steps, start_points = np.nonzero(has_next & ~has_prev)
+    if not len(start_steps):
+        return None
+    end_steps, end_points = np.nonzero(has_prev & ~has_next)
+    return start_steps, positions[start_points], end_steps, positions[end_points]
+
+
+def _line_entry(cells, step_vecs, shape):
+    """Flat index where the line through each cell along its step enters the grid."""
+    coords = np.stack(np.unravel_index(cells, shape), axis=1)
+    back = np.full(len(cells), np.iinfo(np.int64).max, dtype=np.int64)
+    for axis, extent in enumerate(shape):
+        s = step_vecs[:, axis]
+        room = np.where(s > 0, coords[:, axis], extent - 1 - coords[:, axis])
+        back = np.where(s != 0, np.minimum(back, room // np.maximum(np.abs(s), 1)), back)
+    return np.ravel_multi_index(tuple((coords - back[:, None] * step_vecs).T), shape)
+
+
+def _pair_run_bounds(shape, steps, place, start_steps, starts, end_steps, ends):
+    """
+    Matches each run start with its end. Along any one line starts and ends
+    alternate, so ordering both by (step, line, position) pairs them up.
+    """
+    size = np.prod(shape, dtype=np.int64)
+    start_line = start_steps * size + _line_entry(starts, steps[start_steps], shape)
+    end_line = end_steps * size + _line_entry(ends, steps[end_steps], shape)
+    # Cells arrive in flat order within each step, so a stable sort by line suffices.
+    s_order = np.argsort(start_line, kind='stable')
+    e_order = np.argsort(end_line, kind='stable')
+    starts, start_steps = starts[s_order], start_steps[s_order]
+    strides = steps[start_steps] @ place
+    counts = (ends[e_order] - starts) // strides + 1
+    return starts, strides, counts
+
+
+def find_stride_runs(grid: np.ndarray, value, min_points=3, primitive_only=False, stop=None):
+    """
+    Finds every maximal run of `value` along every step vector of `grid`.
+
+    A line through an n-dimensional projection of the text is an arithmetic
+    progression in the flat text, so each run is reported in stride form as
+    parallel arrays (start, stride, count) of flat indices, ordered by start and
+    then stride. Only runs of at least `min_points` cells are returned.
+    `stop`, if given, is polled after each chunk of step vectors; once it
+    returns True the runs found so far are returned.
+    """
+    shape = tuple(int(extent) for extent in grid.shape)
+    match = grid == value
+    positions = np.flatnonzero(match)
+    empty = np.empty(0, dtype=np.int64)
+    min_points = max(2, int(min_points))
+    if len(positions) < min_points or max(shape) < min_points:
+        return empty, empty, empty
+
+    coords = np.stack(np.unravel_index(positions, shape), axis=1).astype(np.int64)
+    place = _place_values(shape)
+    k = len(positions)
+    steps = _lex_positive_steps(shape, min_points)
+    if k * (k - 1) // 2 < len(steps):
+        steps = _pair_steps(coords, shape, min_points)
+    if primitive_only and len(steps):
+        steps = steps[np.gcd.reduce(np.abs(steps), axis=1) == 1]
+    if not len(steps):
+        return empty, empty, empty
+
+    # Whole-grid shifts win once the character fills a sizeable share of the grid.
+    dense = k * _DENSE_RATIO >= match.size
+    per_chunk = max(1, _CHUNK_CELLS // (match.size if dense else k))
+    run_starts, run_strides, run_counts = [], [], []
+    for lo in range(0, len(steps), per_chunk):
+        chunk = steps[lo:lo + per_chunk]
+        if dense:
+            bounds = _dense_run_bounds(match, chunk, min_points)
+        else:
+            bounds = _sparse_run_bounds(match, positions, coords, chunk, place)
+        if bounds is not None:
+            starts, strides, counts = _pair_run_bounds(shape, chunk, place, *bounds)
+            keep = counts >= min_points
+            run_starts.append(starts[keep])
+            run_strides.append(strides[keep])
+            run_counts.append(counts[keep])
+        if stop is not None and stop():
+            break
+
+    if not run_starts:
+        return empty, empty, empty
+    starts, strides, counts = (np.concatenate(a) for a in (run_starts, run_strides, run_counts))
+    order = np.lexsort((strides, starts))
+    return starts[order], strides[order], counts[order]
+
+
+# A candidate line in stride form, with the savings that rank it and the index of
+# the scan shard (character, shape) that found it; 28 bytes instead of a point list.
+CANDIDATE_DTYPE = np.dtype([('start', np.int64), ('stride', np.int64), ('count', np.int32),
+                            ('savings', np.int32), ('shard', np.int32)])
+
+
+def make_candidates(starts, strides, counts, savings) -> np.ndarray:
+    """Packs parallel candidate arrays into one CANDIDATE_DTYPE record array."""
+    candidates = np.zeros(len(starts), dtype=CANDIDATE_DTYPE)
+    candidates['start'], candidates['stride'] = starts, strides
+    candidates['count'], candidates['savings'] = counts, savings
+    return candidates
+
+
+def dedupe_candidates(candidates: np.ndarray) -> np.ndarray:
+    """
+    Keeps one candidate per physical line, i.e. per (start, stride, count) in
+    the flat text, however many shapes lay it out collinearly. The survivor is
+    the one with the most savings (the earliest scanned on ties), which is the
+    copy the greedy selection would have tried first; scan order is preserved.
+    """
+    if not len(candidates):
+        return candidates
+    order = np.lexsort((-candidates['savings'].astype(np.int64), candidates['count'],
+                        candidates['stride'], candidates['start']))
+    ranked = candidates[order]
+    first = np.ones(len(ranked), dtype=bool)
+    first[1:] = ((ranked['start'][1:] != ranked['start'][:-1])
+                 | (ranked['stride'][1:] != ranked['stride'][:-1])
+                 | (ranked['count'][1:] != ranked['count'][:-1]))
+    return candidates[np.sort(order[first])]
+
+
+def select_candidates(candidates: np.ndarray, claimed: np.ndarray) -> np.ndarray:
+    """
+    Greedily claims candidates in order of decreasing savings (ties keep their
+    scan order), skipping any whose cells are not all still free. Marks the
+    claimed cells in `claimed` and returns the chosen indices in claim order.
+    """
+    order = np.argsort(-candidates['savings'], kind='stable')
+    starts = candidates['start'][order]
+    strides = candidates['stride'][order]
+    ends = starts + strides * (candidates['count'][order].astype(np.int64) - 1)
+    # Lines running past the text (into a padded last row) can never be claimed.
+    fits = ends < len(claimed)
+    chosen = []
+    for i, start, end, stride in zip(order[fits].tolist(), starts[fits].tolist(),
+                                     ends[fits].tolist(), strides[fits].tolist()):
+        cells = claimed[start:end + 1:stride]
+        if not cells.any():
+            cells[:] = True
+            chosen.append(i)
+    return np.array(chosen, dtype=np.int64)
+
+
+def stride_repetition(codes: np.ndarray, values, max_lag: int, stop=None):
+    """
+    For every stride 0..max_lag, the fraction of positions i for which
+    text[i] == text[i + stride], counting only the given character codes.
+    The per-character autocorrelations are computed with numpy's FFT, in
+    batches so that memory stays bounded on long texts. `stop` is polled
+    after each batch; once it returns True the remaining values are left
+    out. Returns the rates and how many of `values` they cover.
+    """
+    length = len(codes)
+    max_lag = max(0, min(max_lag, length - 1))
+    matches = np.zeros(max_lag + 1)
+    covered = 0
+    if length and len(values):
+        n = 1 << (2 * length - 1).bit_length()
+        per_batch = max(1, _CHUNK_CELLS * 4 // n)
+        values = np.asarray(values, dtype=codes.dtype)
+        for lo in range(0, len(values), per_batch):
+            indicator = (codes[None, :] == values[lo:lo + per_batch, None]).astype(np.float64)
+            spectrum = np.fft.rfft(indicator, n=n, axis=1)
+            power = spectrum.real ** 2 + spectrum.imag ** 2
+            matches += np.fft.irfft(power, n=n, axis=1)[:, :max_lag + 1].sum(axis=0)
+            covered = min(lo + per_batch, len(values))
+            if stop is not None and stop():
+                break
+    overlap = np.maximum(length - np.arange(max_lag + 1), 1)
+    return np.rint(matches) / overlap, covered
+
+
+def repetition_profile(codes: np.ndarray, min_count: int, max_lag: int, stop=None):
+    """
+    Repetition rate per stride over the characters occurring at least
+    `min_count` times, with the rate their frequencies alone would give and
+    the smallest overlap a rate was measured on. See rank_strides. The most
+    frequent characters are profiled first, so a profile cut short by
+    `stop` covers those that weigh most.
+    """
+    values, counts = np.unique(codes, return_counts=True)
+    frequent = np.flatnonzero(counts >= min_count)
+    frequent = frequent[np.argsort(-counts[frequent], kind='stable')]
+    repetition, covered = stride_repetition(codes, values[frequent], max_lag, stop)
+    baseline = float(np.sum((counts[frequent[:covered]] / max(len(codes), 1)) ** 2))
+    return repetition, baseline, len(codes) - len(repetition)
+
+
+def rank_strides(repetition: np.ndarray, top: int, baseline: float, overlap: int):
+    """
+    Picks up to `top` strides (>= 1) by repetition rate, strongest first,
+    keeping only those significantly above `baseline`, the rate expected
+    from the character frequencies alone.
+    """
+    noise = 5 * math.sqrt(max(baseline * (1 - baseline), 0) / max(overlap, 1))
+    lags = np.flatnonzero(repetition > baseline + noise)
+    lags = lags[lags > 0]
+    return lags[np.lexsort((lags, -repetition[lags]))][:top].tolist()
+
+
+def stride_runs(codes: np.ndarray, stride: int):
+    """
+    Maximal runs of equal characters spaced `stride` apart (two points or
+    more), i.e. the longest filaments that stride could carry, as parallel
+    arrays of run lengths and the code point each run repeats.
+    """
+    length = len(codes)
+    if not 0 < stride < length:
+        return np.zeros(0, dtype=np.int64), codes[:0]
+    rows = -(-length // stride)
+    grid = pad_codes(codes, rows * stride).reshape(rows, stride)
+    linked = np.zeros((stride, rows), dtype=bool)
+    linked[:, :-1] = (grid[1:] == grid[:-1]).T
+    # Links reaching into the padding of the last row are not real.
+    linked[length % stride or stride:, rows - 2] = False
+    edges = np.diff(linked.reshape(-1).astype(np.int8), prepend=0, append=0)
+    firsts = np.flatnonzero(edges == 1)
+    column, row = np.divmod(firsts, rows)
+    return np.flatnonzero(edges == -1) - firsts + 1, codes[row * stride + column]
+
+
+def run_savings(runs: np.ndarray, min_points: int, max_points: int) -> int:
+    """
+    Characters saved by covering `runs` with filaments of at most `max_points`
+    points, each costing as much as a break-even filament of `min_points - 1`.
+    """
+    if max_points < min_points:
+        return 0
+    cost = min_points - 1
+    full, rest = np.divmod(runs, max_points)
+    return int((full * (max_points - cost)).sum() + np.maximum(rest - cost, 0).sum())
+
+
+def step_space(shape, min_points=2):
+    """Number of lex-positive step vectors along which `min_points` cells fit in `shape`."""
+    reach = [(extent - 1) // (max(2, min_points) - 1) for extent in shape]
+    return (math.prod(2 * r + 1 for r in reach) - 1) // 2
+
+
+def plan_shards(char_counts, shapes, min_points):
+    """
+    Keeps only the (char, shape) shards whose best case can pay for its own
+    description. `min_points(char, shape)` is the fewest points a profitable
+    line needs: a character with fewer occurrences, or a shape with no line
+    that long, can never save anything. Returns the surviving shards along
+    with a summary of how much of the search space was pruned.
+    """
+    shards, steps_total, steps_kept = [], 0, 0
+    for char, count in char_counts:
+        for shape in shapes:
+            need = min_points(char, shape)
+            steps_total += step_space(shape)
+            if count >= need and max(shape) >= need:
+                shards.append((char, shape))
+                steps_kept += step_space(shape, need)
+    kept_chars = {char for char, _ in shards}
+    kept_shapes = {shape for _, shape in shards}
+    stats = {
+        'shards': len(char_counts) * len(shapes), 'shards_pruned': len(char_counts) * len(shapes) - len(shards),
+        'chars': len(char_counts), 'chars_pruned': len(char_counts) - len(kept_chars),
+        'shapes': len(shapes), 'shapes_pruned': len(shapes) - len(kept_shapes),
+        'steps': steps_total, 'steps_pruned': steps_total - steps_kept,
+    }
+    return shards, stats
+
+
+def describe_pruning(stats):
+    """One-line summary of a plan_shards report for the progress log."""
+    share = 100 * stats['steps_pruned'] / stats['steps'] if stats['steps'] else 0
+    return (f"  Pruned {stats['shards_pruned']}/{stats['shards']} shards "
+            f"({stats['chars_pruned']} chars, {stats['shapes_pruned']} shapes) "
+            f"and {share:.1f}% of step vectors as unable to save space.")
+
+
+def order_shards(codes: np.ndarray, shards, min_points):
+    """
+    Scan order for a survey that may be cut short. A shard's promise is what
+    lines along its shape's axes alone could save: the runs of its character
+    at each axis stride, cut at that axis's extent. The most promising shards
+    go first, plan order breaking ties. Returns shard indices.
+    """
+    runs, promise = {}, []
+    for char, shape in shards:
+        need, best = min_points(char, shape), 0
+        for stride, extent in zip(_place_values(shape).tolist(), shape):
+            if stride not in runs:
+                runs[stride] = stride_runs(codes, stride)
+            lengths, values = runs[stride]
+            best = max(best, run_savings(lengths[values == ord(char)], need, extent))
+        promise.append(best)
+    return sorted(range(len(shards)), key=lambda i: -promise[i])
+
+
+def start_deadline(time_budget):
+    """
+    monotonic() deadline for a budget in seconds; None means no deadline.
+    The monotonic clock is system-wide, so pool workers can poll it too.
+    """
+    return None if time_budget is None else time.monotonic() + time_budget
+
+
+def deadline_passed(deadline):
+    """True once a start_deadline() deadline has passed; never for None."""
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def deadline_stop(deadline):
+    """A picklable `stop` callable for find_stride_runs and friends; None without a deadline."""
+    return functools.partial(deadline_passed, deadline) if deadline is not None else None
+
+
+def scan_stop(deadline, checkpoint=None):
+    """
+    The in-process `stop` callable: calls `checkpoint()`, which may raise to
+    abandon the run (e.g. on cancellation), then says whether the deadline
+    has passed. None if there is neither.
+    """
+    if checkpoint is None:
+        return deadline_stop(deadline)
+
+    def stop():
+        checkpoint()
+        return deadline_passed(deadline)
+    return stop
+
+
+def budget_exhausted(deadline, found, max_candidates):
+    """True once the deadline has passed or `found` candidates reach the cap."""
+    return deadline_passed(deadline) or (max_candidates is not None and found >= max_candidates)
+
+
+def record_coverage(stats, shards, scanned, min_points, cut=False):
+    """
+    Adds to a plan_shards report how much of the planned search was scanned;
+    `cut` says the last shards scanned may have been stopped part way.
+    """
+    stats['shards_scanned'] = len(scanned)
+    stats['steps_scanned'] = sum(step_space(shards[i][1], min_points(*shards[i])) for i in scanned)
+    stats['complete'] = len(scanned) == len(shards) and not cut
+
+
+def describe_coverage(stats):
+    """One-line summary of a record_coverage report for the progress log."""
+    planned = stats['steps'] - stats['steps_pruned']
+    share = 100 * stats['steps_scanned'] / planned if planned else 100
+    return (f"  Budget spent after {stats['shards_scanned']}/{stats['shards'] - stats['shards_pruned']} "
+            f"shards ({share:.1f}% of the remaining step vectors).")
+
+
+def decimal_width(values: np.ndarray) -> np.ndarray:
+    """Number of characters needed to print each non-negative integer in base 10."""
+    values = np.asarray(values, dtype=np.int64)
+    width = np.ones(values.shape, dtype=np.int64)
+    threshold = 10
+    while True:
+        over = values >= threshold
+        if not over.any():
+            return width
+        width += over
+        threshold *= 10
+
+
+def encode_text(text: str) -> np.ndarray:
+    """
+    Encodes a string as an array of Unicode code points, using the narrowest
+    unsigned integer type (uint8, uint16 or uint32) that holds every one of them.
+    """
+    try:
+        return np.frombuffer(text.encode('latin-1'), dtype=np.uint8)
+    except UnicodeEncodeError:
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype='<u4')
+        return codes.astype(np.uint16) if codes.max() < 1 << 16 else codes
+
+
+def decode_utf8(data) -> np.ndarray:
+    """
+    Decodes a UTF-8 buffer straight into code points, like encode_text but
+    without building a Python string. Pure ASCII comes back as a zero-copy
+    uint8 view of the buffer.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if not (raw >= 0x80).any():
+        return raw
+    leads = np.flatnonzero((raw & 0xc0) != 0x80)
+    width = np.diff(leads, append=len(raw))
+    lead = raw[leads]
+    expected = 1 + (lead >= 0xc0) + (lead >= 0xe0) + (lead >= 0xf0)
+    if len(leads) == 0 or leads[0] != 0 or (width != expected).any() or (lead >= 0xf8).any():
+        raise ValueError("Input is not valid UTF-8.")
+    codes = (lead & np.array([0x7f, 0x1f, 0x0f, 0x07], dtype=np.uint8)[width - 1]).astype(np.uint32)
+    for k in range(1, 4):
+        more = np.flatnonzero(width > k)
+        codes[more] = (codes[more] << 6) | (raw[leads[more] + k] & 0x3f)
+    # Overlong forms, surrogates and out-of-range values are as invalid as bad framing.
+    if ((codes < np.array([0, 0x80, 0x800, 0x10000])[width - 1]) | ((codes >= 0xd800) & (codes < 0xe000))
+            | (codes > 0x10ffff)).any():
+        raise ValueError("Input is not valid UTF-8.")
+    return codes.astype(np.uint16) if codes.max() < 1 << 16 else codes
+
+
+def map_bytes(path):
+    """The bytes of the file at `path`, memory-mapped read-only (b'' for an empty file)."""
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def map_text(path) -> np.ndarray:
+    """
+    Code points of a UTF-8 file, read through mmap. An ASCII file is used
+    in place, backed by the mapping; others are decoded in one pass.
+    """
+    return decode_utf8(map_bytes(path))
+
+
+def write_codes(dst, codes: np.ndarray, chunk: int = 1 << 20):
+    """Writes code points to a binary stream as UTF-8, a chunk at a time."""
+    for lo in range(0, len(codes), chunk):
+        dst.write(decode_codes(codes[lo:lo + chunk]).encode('utf-8'))
+
+
+def decode_codes(codes: np.ndarray) -> str:
+    """Inverse of encode_text: turns an array of code points back into a string."""
+    if not len(codes) or codes.max() < 1 << 8:
+        return codes.astype(np.uint8).tobytes().decode('latin-1')
+    return codes.astype('<u4').tobytes().decode('utf-32-le')
+
+
+def pad_codes(codes: np.ndarray, size: int) -> np.ndarray:
+    """Copies the code points into a zero ('\0') padded buffer of at least `size` cells."""
+    padded = np.zeros(max(size, len(codes)), dtype=codes.dtype)
+    padded[:len(codes)] = codes
+    return padded
+
+
+# Marks canvas cells painted by a vector whose character parsed as empty; past
+# the last Unicode code point, so it can never collide with a real character.
+_EMPTY_CELL = 0x110000
+
+
+def paint_canvas(length: int, lines, remnant: str) -> str:
+    """Rebuilds a text from its blueprint parts; see paint_codes."""
+    return decode_codes(paint_codes(length, lines, remnant))
+
+
+def paint_codes(length: int, lines, remnant) -> np.ndarray:
+    """
+    Rebuilds the code points of a text from its blueprint parts, the
+    remnant as a string or as code points. `lines` yields (char, start,
+    stride, count) in key order, each painted with one strided write (later
+    lines overwrite earlier ones; cells at or past `length` are skipped).
+    The remnant then fills the unpainted cells in order with one masked
+    scatter, and cells left unpainted are dropped. Painted cells are tracked
+    in a mask of their own, since '\0' is a character like any other.
+    """
+    canvas = np.zeros(length, dtype=np.uint32)
+    painted = np.zeros(length, dtype=bool)
+    for char, start, stride, count in lines:
+        code = ord(char) if char else _EMPTY_CELL
+        if stride > 0 and start >= 0:
+            stop = min(start + stride * (count - 1), length - 1)
+            cells = slice(start, stop + 1, stride)
+        else:
+            # Degenerate or reversed vectors index like the list canvas they replace.
+            cells = start + stride * np.arange(count, dtype=np.int64)
+            cells = cells[cells < length]
+        canvas[cells] = code
+        painted[cells] = True
+    holes = np.flatnonzero(~painted)
+    fill = remnant[:len(holes)]
+    if isinstance(fill, str):
+        fill = encode_text(fill)
+    canvas[holes[:len(fill)]] = fill
+    painted[holes[:len(fill)]] = True
+    return canvas[painted & (canvas != _EMPTY_CELL)]
+
+
+# Binary blueprint container:
+#   MAGIC, one version byte, one byte of engine dimensionality (2 or 3),
+#   varint text length, varint byte size of the vector table,
+#   (version 2) varint rank sampling interval and varint byte size of the rank index,
+#   the vector table, (version 2) the rank index, then the remnant as raw UTF-8 to the end.
+# The vector table is a flat sequence of LEB128 varints: the number of stride
+# groups, then per group its stride, its number of vectors and, per vector in
+# start order, (code point, start minus the previous start, count).
+# The rank index samples every `rank_every` text positions p > 0: from the rank of
+# p among the unclaimed cells, the byte offset in the remnant of the character
+# that fills the first unclaimed cell from p on, as a delta from the previous
+# sample. An interval of 0 means no index.
+BLUEPRINT_MAGIC = b'VTB'
+BLUEPRINT_VERSION = 2
+RANK_EVERY = 4096
+
+
+def varint_width(values) -> np.ndarray:
+    """Number of bytes each non-negative integer takes as an LEB128 varint."""
+    values = np.asarray(values, dtype=np.uint64)
+    width = np.ones(values.shape, dtype=np.int64)
+    for shift in range(7, 64, 7):
+        over = values >> np.uint64(shift) != 0
+        if not over.any():
+            break
+        width += over
+    return width
+
+
+def utf8_width(codes) -> np.ndarray:
+    """Number of bytes each code point takes in UTF-8."""
+    codes = np.asarray(codes, dtype=np.int64)
+    return 1 + (codes >= 0x80) + (codes >= 0x800) + (codes >= 0x10000)
+
+
+def encode_varints(values) -> bytes:
+    """Packs non-negative integers as consecutive LEB128 varints."""
+    values = np.asarray(values, dtype=np.uint64)
+    width = varint_width(values)
+    offsets = np.cumsum(width) - width
+    out = np.zeros(int(width.sum()), dtype=np.uint8)
+    for byte in range(int(width.max(initial=0))):
+        present = width > byte
+        chunk = (values[present] >> np.uint64(7 * byte)) & np.uint64(0x7f)
+        more = np.where(width[present] > byte + 1, 0x80, 0).astype(np.uint64)
+        out[offsets[present] + byte] = chunk | more
+    return out.tobytes()
+
+
+def decode_varints(data) -> np.ndarray:
+    """Unpacks a buffer holding nothing but consecutive LEB128 varints."""
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if not len(raw):
+        return np.zeros(0, dtype=np.uint64)
+    if raw[-1] & 0x80:
+        raise ValueError("Truncated varint in blueprint.")
+    ends = np.flatnonzero(raw < 0x80)
+    firsts = np.concatenate(([0], ends[:-1] + 1))
+    shifts = 7 * (np.arange(len(raw)) - np.repeat(firsts, ends - firsts + 1))
+    if shifts.max() > 63:
+        raise ValueError("Oversized varint in blueprint.")
+    parts = (raw & 0x7f).astype(np.uint64) << shifts.astype(np.uint64)
+    return np.add.reduceat(parts, firsts)
+
+
+def read_varint(data, pos: int):
+    """Reads one varint at `pos`; returns its value and the position after it."""
+    value = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated varint in blueprint.")
+        byte = data[pos]
+        value |= (byte & 0x7f) << shift
+        pos, shift = pos + 1, shift + 7
+        if byte < 0x80:
+            return value, pos
+
+
+def binary_line_savings(codes, starts, counts) -> np.ndarray:
+    """
+    Bytes a vector saves in the binary container: the UTF-8 bytes of its
+    points leave the remnant, and its varint (code, start, count) entry is
+    added. The start is charged in full, an upper bound on its delta.
+    """
+    return (counts * utf8_width(codes)
+            - varint_width(codes) - varint_width(starts) - varint_width(counts))
+
+
+def pack_blueprint(ndim: int, length: int, codes, starts, strides, counts, remnant: str,
+                   rank_every: int = RANK_EVERY) -> bytes:
+    """Encodes selected lines, in stride form, and the remnant as a binary blueprint."""
+    buffer = io.BytesIO()
+    write_blueprint(buffer, ndim, length, codes, starts, strides, counts, encode_text(remnant), rank_every)
+    return buffer.getvalue()
+
+
+def write_blueprint(dst, ndim: int, length: int, codes, starts, strides, counts, remnant: np.ndarray,
+                    rank_every: int = RANK_EVERY):
+    """
+    Writes a binary blueprint to the binary stream `dst`, section by section,
+    with the remnant given as code points and streamed out in chunks.
+    """
+    codes, starts, strides, counts = (np.asarray(a, dtype=np.int64) for a in (codes, starts, strides, counts))
+    order = np.lexsort((starts, strides))
+    codes, starts, strides, counts = codes[order], starts[order], strides[order], counts[order]
+    groups, first, sizes = np.unique(strides, return_index=True, return_counts=True)
+    deltas = np.diff(starts, prepend=0)
+    deltas[first] = starts[first]
+    entries = np.stack((codes, deltas, counts), axis=1)
+    table = [np.array([len(groups)])]
+    for stride, lo, n in zip(groups, first, sizes):
+        table.append(np.array([stride, n]))
+        table.append(entries[lo:lo + n].reshape(-1))
+    table = encode_varints(np.concatenate(table))
+    rank = _rank_index(length, starts, strides, counts, remnant, rank_every) if rank_every else b''
+    dst.write(BLUEPRINT_MAGIC + bytes([BLUEPRINT_VERSION, ndim]))
+    dst.write(encode_varints([length, len(table), rank_every, len(rank)]))
+    dst.write(table)
+    dst.write(rank)
+    write_codes(dst, remnant)
+
+
+def write_text_blueprint(dst, length: int, key, remnant: np.ndarray):
+    """Writes a 'length¬key‡remnant' blueprint to the binary stream `dst` as UTF-8, a vector at a time."""
+    dst.write(f"{length}¬".encode('utf-8'))
+    for i, vector_desc in enumerate(key):
+        dst.write((f"§{vector_desc}" if i else vector_desc).encode('utf-8'))
+    dst.write("‡".encode('utf-8'))
+    write_codes(dst, remnant)
+
+
+def _rank_index(length, starts, strides, counts, remnant, rank_every):
+    """Rank samples for write_blueprint: the remnant byte offset every `rank_every` cells."""
+    claimed = np.zeros(length, dtype=bool)
+    for start, stride, count in zip(starts.tolist(), strides.tolist(), counts.tolist()):
+        claimed[start:start + stride * (count - 1) + 1:max(stride, 1)] = True
+    samples = np.arange(rank_every, length + 1, rank_every)
+    unclaimed = samples - np.concatenate(([0], np.cumsum(claimed)))[samples]
+    offsets = np.concatenate(([0], np.cumsum(utf8_width(remnant))))
+    return encode_varints(np.diff(offsets[np.minimum(unclaimed, len(offsets) - 1)], prepend=0))
+
+
+def _read_header(data):
+    """Parses a binary blueprint header into a dict of its fields and section offsets."""
+    data = memoryview(data)
+    if bytes(data[:len(BLUEPRINT_MAGIC)]) != BLUEPRINT_MAGIC or len(data) < len(BLUEPRINT_MAGIC) + 2:
+        raise ValueError("Invalid blueprint format. Expected a binary tessellation blueprint.")
+    version, ndim = data[len(BLUEPRINT_MAGIC)], data[len(BLUEPRINT_MAGIC) + 1]
+    if version not in (1, 2):
+        raise ValueError(f"Unsupported binary blueprint version: {version}")
+    pos = len(BLUEPRINT_MAGIC) + 2
+    length, pos = read_varint(data, pos)
+    table_size, pos = read_varint(data, pos)
+    rank_every = rank_size = 0
+    if version >= 2:
+        rank_every, pos = read_varint(data, pos)
+        rank_size, pos = read_varint(data, pos)
+    return {'ndim': ndim, 'length': length, 'rank_every': rank_every, 'data': data,
+            'table': (pos, pos + table_size), 'rank': (pos + table_size, pos + table_size + rank_size),
+            'remnant': pos + table_size + rank_size}
+
+
+def _read_lines(header):
+    """Decodes the vector table into parallel (codes, starts, strides, counts) arrays."""
+    lo, hi = header['table']
+    table = decode_varints(header['data'][lo:hi]).astype(np.int64)
+    groups, i = [], 1
+    for _ in range(int(table[0]) if len(table) else 0):
+        stride, n = int(table[i]), int(table[i + 1])
+        entries = table[i + 2:i + 2 + 3 * n].reshape(n, 3)
+        groups.append((entries[:, 0], np.cumsum(entries[:, 1]), np.full(n, stride, dtype=np.int64), entries[:, 2]))
+        i += 2 + 3 * n
+    if not groups:
+        return tuple(np.zeros(0, dtype=np.int64) for _ in range(4))
+    return tuple(np.concatenate(parts) for parts in zip(*groups))
+
+
+def unpack_blueprint(data):
+    """
+    Decodes a binary blueprint into (ndim, length, lines, remnant), with
+    `lines` as (char, start, stride, count) tuples ready for paint_canvas.
+    """
+    header = _read_header(data)
+    codes, starts, strides, counts = _read_lines(header)
+    lines = list(zip(map(chr, codes.tolist()), starts.tolist(), strides.tolist(), counts.tolist()))
+    remnant = bytes(header['data'][header['remnant']:]).decode('utf-8')
+    return header['ndim'], header['length'], lines, remnant
+
+
+def unpack_blueprint_codes(data):
+    """
+    Like unpack_blueprint, but with the remnant decoded straight into code
+    points from `data` (bytes or an mmap), for paint_codes.
+    """
+    header = _read_header(data)
+    codes, starts, strides, counts = _read_lines(header)
+    lines = list(zip(map(chr, codes.tolist()), starts.tolist(), strides.tolist(), counts.tolist()))
+    remnant = decode_utf8(header['data'][header['remnant']:])
+    return header['ndim'], header['length'], lines, remnant
+
+
+def points_before(starts, strides, counts, pos) -> np.ndarray:
+    """How many points of each line (start, stride, count) lie before flat index `pos`."""
+    starts, strides, counts = (np.asarray(a, dtype=np.int64) for a in (starts, strides, counts))
+    ahead = np.maximum(pos - starts, 0)
+    return np.where(strides > 0, np.minimum(-(-ahead // np.maximum(strides, 1)), counts),
+                    np.where(ahead > 0, counts, 0))
+
+
+def _paint_window(start, end, codes, starts, strides, counts, remnant):
+    """Paints the lines over text positions [start, end) and fills the rest from `remnant` in order."""
+    first = points_before(starts, strides, counts, start)
+    last = points_before(starts, strides, counts, end)
+    touching = np.flatnonzero(last > first)
+    window = np.zeros(end - start, dtype=np.uint32)
+    painted = np.zeros(end - start, dtype=bool)
+    for i in touching.tolist():
+        lo = int(starts[i] + strides[i] * first[i]) - start
+        cells = slice(lo, int(starts[i] + strides[i] * (last[i] - 1)) - start + 1, max(int(strides[i]), 1))
+        window[cells] = codes[i]
+        painted[cells] = True
+    holes = np.flatnonzero(~painted)
+    fill = encode_text(remnant[:len(holes)])
+    window[holes[:len(fill)]] = fill
+    painted[holes[:len(fill)]] = True
+    return decode_codes(window[painted])
+
+
+def _clip_span(length, start, end):
+    if start < 0 or end < start:
+        raise ValueError(f"Invalid span [{start}, {end}).")
+    return min(start, length), min(end, length)
+
+
+def extract_lines(length: int, lines, remnant: str, start: int, end: int) -> str:
+    """
+    Characters [start, end) of the text a blueprint describes, from its
+    lines as (char, start, stride, count) and its remnant string, without
+    rebuilding the rest. The lines touching the span and the remnant offset
+    of `start` both follow arithmetically from the stride form.
+    """
+    start, end = _clip_span(length, start, end)
+    chars, starts, strides, counts = zip(*lines) if lines else ((), (), (), ())
+    codes = np.array([ord(char) for char in chars], dtype=np.int64)
+    starts, strides, counts = (np.array(a, dtype=np.int64) for a in (starts, strides, counts))
+    offset = start - int(points_before(starts, strides, counts, start).sum())
+    return _paint_window(start, end, codes, starts, strides, counts, remnant[offset:])
+
+
+def extract_blueprint(data, start: int, end: int) -> str:
+    """
+    Characters [start, end) of the text a binary blueprint describes. The
+    rank index gives the remnant byte offset at the last sample before
+    `start`, so only the remnant bytes from there on are decoded; blueprints
+    without an index decode the remnant prefix.
+    """
+    header = _read_header(data)
+    start, end = _clip_span(header['length'], start, end)
+    codes, starts, strides, counts = _read_lines(header)
+    remnant = header['data'][header['remnant']:]
+    sample = start // header['rank_every'] if header['rank_every'] else 0
+    base = byte_offset = 0
+    if sample:
+        lo, hi = header['rank']
+        base = sample * header['rank_every']
+        byte_offset = int(decode_varints(header['data'][lo:hi])[:sample].sum())
+    # Characters of the remnant between the sample and `start`, then those the span needs.
+    skip = (start - base) - int((points_before(starts, strides, counts, start)
+                                 - points_before(starts, strides, counts, base)).sum())
+    wanted = skip + (end - start)
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    tail = decoder.decode(bytes(remnant[byte_offset:byte_offset + 4 * wanted]))
+    return _paint_window(start, end, codes, starts, strides, counts, tail[skip:wanted])
+
+
+# The shared code points as seen by a pool worker: (shared memory block, array view).
+_shared_codes = None
+
+
+def _attach_shared_codes(name, size, dtype):
+    global _shared_codes
+    block = shared_memory.SharedMemory(name=name)
+    _shared_codes = (block, np.ndarray(size, dtype=dtype, buffer=block.buf))
+
+
+def _scan_shared_shard(scan, char, shape):
+    grid = _shared_codes[1][:math.prod(shape)].reshape(shape)
+    return scan(grid, char)
+
+
+def scan_shards_parallel(scan, codes: np.ndarray, shards, workers: int):
+    """
+    Runs `scan(grid, char)` for every (char, shape) shard on a process pool and
+    yields the results in shard order, so merging them matches a serial scan.
+    The padded code points are placed once in shared memory and every worker
+    reshapes its grids from that block instead of receiving a pickled copy
+    per task. Closing the generator cancels the shards not yet started.
+    """
+    if not shards:
+        return
+    block = shared_memory.SharedMemory(create=True, size=max(codes.nbytes, 1))
+    pool = None
+    try:
+        np.ndarray(codes.shape, dtype=codes.dtype, buffer=block.buf)[:] = codes
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared_codes,
+                                   initargs=(block.name, len(codes), codes.dtype.str))
+        futures = [pool.submit(_scan_shared_shard, scan, char, shape) for char, shape in shards]
+        for future in futures:
+            yield future.result()
+    finally:
+        # A consumer that stops early (e.g. on a time budget) only waits for the
+        # shards already running; queued ones are dropped.
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        block.close()
+        block.unlink()
+
+
+def scan_candidates(engine, shapes, scan, deadline, log, scanning: str, merged: str) -> np.ndarray:
+    """
+    The candidate scan both engines share: plans the (char, shape) shards of
+    `engine`'s text, scans them with `scan(grid, char, fmt=...)` (through
+    its cache and process pool, if any) until its budget runs out, and
+    returns the candidates with duplicate lines merged. Sets the engine's
+    `shards` and `search_stats` and feeds its `stats`; its `checkpoint`, if
+    any, is called throughout and may raise to abandon the scan. `scanning` and
+    `merged` are the progress messages, formatted with {char}, {shard} and
+    {shards}, and with {count}.
+    """
+    codes, counts = np.unique(engine.codes, return_counts=True)
+    min_points = functools.partial(engine._min_line_points, fmt=engine.format)
+    shards, engine.search_stats = plan_shards(
+        [(chr(code), count) for code, count in zip(codes, counts)], shapes, min_points)
+    engine.shards = shards
+    log(describe_pruning(engine.search_stats))
+
+    # Under a budget the most promising shards go first, so running out drops the least promising.
+    if engine.time_budget is None and engine.max_candidates is None:
+        order = list(range(len(shards)))
+    else:
+        order = order_shards(engine.codes, shards, min_points)
+    queue = [shards[i] for i in order]
+    # Every grid is a zero-copy reshape of one padded code-point buffer.
+    padded = pad_codes(engine.codes, max((math.prod(shape) for _, shape in shards), default=0))
+    # Shards poll the deadline and the engine's checkpoint between step chunks, so one long
+    # shard can neither overrun the budget nor hold off a cancellation. Pool workers cannot
+    # reach the checkpoint; it is called between their shards instead.
+    stop = deadline_stop(deadline) if engine.workers > 1 else scan_stop(deadline, engine.checkpoint)
+    scan = functools.partial(scan, fmt=engine.format, stop=stop)
+
+    def scan_queue(queue):
+        if engine.workers > 1:
+            return scan_shards_parallel(scan, padded, queue, engine.workers)
+        return (scan(padded[:math.prod(shape)].reshape(shape), char) for char, shape in queue)
+
+    if engine.cache is None:
+        results = scan_queue(queue)
+    else:
+        digest = text_digest(engine.codes)
+        keys = [cache_key('shard', engine.ndim, digest, engine.format, char, shape) for char, shape in queue]
+        # A shard that finished after the deadline may be partial, so it is not cached.
+        results = cached_blocks(engine.cache, keys, lambda missing: scan_queue([queue[i] for i in missing]),
+                                keep=lambda: not deadline_passed(deadline))
+
+    blocks, found, scanned = [], 0, []
+    try:
+        for shard in order:
+            # The most promising shard is always started, so even a tiny budget yields lines;
+            # the deadline stops it between step chunks like any other.
+            if scanned and budget_exhausted(deadline, found, engine.max_candidates):
+                break
+            if engine.checkpoint is not None:
+                engine.checkpoint()
+            char = shards[shard][0]
+            if not scanned or shards[scanned[-1]][0] != char:
+                log(scanning.format(char=char, shard=len(scanned) + 1, shards=len(shards)))
+            started = time.perf_counter()
+            block = next(results)
+            engine.stats.record_scan(shard, time.perf_counter() - started)
+            block['shard'] = shard
+            blocks.append(block)
+            found += len(block)
+            scanned.append(shard)
+    finally:
+        results.close()
+    record_coverage(engine.search_stats, shards, scanned, min_points, cut=deadline_passed(deadline))
+    if not engine.search_stats['complete']:
+        log(describe_coverage(engine.search_stats))
+    candidates = np.concatenate(blocks) if blocks else make_candidates([], [], [], [])
+    # Back in plan order, so a complete scan selects exactly as if it had run in that order.
+    candidates = candidates[np.argsort(candidates['shard'], kind='stable')]
+    engine.stats.record_candidates(shards, candidates)
+    # A line is found once per shape that lays it out collinearly; keep its cheapest copy.
+    unique = dedupe_candidates(candidates)
+    if len(unique) < len(candidates):
+        log(merged.format(count=len(candidates) - len(unique)))
+    return unique
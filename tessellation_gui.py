@@ -0,0 +1,235 @@
+import multiprocessing
+import os
+import queue
+import re
+import tkinter as tk
+from tkinter import scrolledtext, messagebox, font, filedialog, ttk
+
+from VectorialTessellation import VectorialTessellator
+
+# The engine's progress queue is drained this often, and the status redrawn at most once per drain.
+PROGRESS_INTERVAL_MS = 100
+# Messages handled per drain, so a chatty engine can never starve the event loop.
+MAX_MESSAGES_PER_DRAIN = 1000
+# Text widgets show at most this many characters; the rest stays in memory and can be saved.
+DISPLAY_LIMIT = 100_000
+TRUNCATION_NOTE = "\n\n[... {} more characters not shown; use Save to write the whole text ...]"
+# Both engines report Phase 1 progress as "(shard i/n)".
+SHARD_PROGRESS = re.compile(r"shard (\d+)/(\d+)")
+
+
+def compress_worker(text, progress):
+    """
+    Runs in a separate process so a long scan never blocks Tk: progress
+    messages and then ('done', blueprint) or ('error', message) go to the
+    `progress` queue.
+    """
+    try:
+        tessellator = VectorialTessellator(text, update_callback=lambda message: progress.put(('log', message)))
+        progress.put(('done', tessellator.generate_blueprint()))
+    except Exception as e:
+        progress.put(('error', str(e)))
+
+class App(tk.Tk):
+    def __init__(self):
+        super().__init__()
+        self.title("Vectorial Tessellation Engine")
+        self.geometry("800x600")
+        self.configure(bg="#f0f0f0")
+        
+        # --- UI Elements ---
+        default_font = font.nametofont("TkDefaultFont")
+        default_font.configure(family="Helvetica", size=10)
+        mono_font = font.Font(family="Courier New", size=10)
+
+        # Input Frame
+        input_frame = tk.Frame(self, padx=10, pady=10, bg="#f0f0f0")
+        input_frame.pack(fill=tk.X)
+        
+        input_label_frame = tk.Frame(input_frame, bg="#f0f0f0")
+        input_label_frame.pack(fill=tk.X)
+        tk.Label(input_label_frame, text="Original String:", bg="#f0f0f0", font=default_font).pack(side=tk.LEFT)
+        tk.Button(input_label_frame, text="Load from File...", command=self.load_file).pack(side=tk.RIGHT)
+        
+        self.input_text = scrolledtext.ScrolledText(input_frame, height=8, font=mono_font, wrap=tk.WORD)
+        self.input_text.pack(fill=tk.X, expand=True)
+
+        # Control Frame
+        control_frame = tk.Frame(self, padx=10, pady=5, bg="#f0f0f0")
+        control_frame.pack(fill=tk.X)
+        self.compress_button = tk.Button(control_frame, text="Generate Blueprint", command=self.run_compression)
+        self.compress_button.pack(side=tk.LEFT)
+        self.decompress_button = tk.Button(control_frame, text="Reconstruct from Blueprint", command=self.run_reconstruction)
+        self.decompress_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_button = tk.Button(control_frame, text="Cancel", command=self.cancel_compression, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT)
+        self.save_button = tk.Button(control_frame, text="Save Blueprint...", command=self.save_blueprint,
+                                     state=tk.DISABLED)
+        self.save_button.pack(side=tk.RIGHT)
+        self.progress_bar = ttk.Progressbar(control_frame, mode='determinate', maximum=100)
+        self.progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
+        
+        # Results Frame
+        results_frame = tk.Frame(self, padx=10, pady=10, bg="#f0f0f0")
+        results_frame.pack(fill=tk.BOTH, expand=True)
+        tk.Label(results_frame, text="Compiled Blueprint:", bg="#f0f0f0", font=default_font).pack(anchor=tk.W)
+        self.blueprint_text = scrolledtext.ScrolledText(results_frame, height=8, font=mono_font, wrap=tk.WORD)
+        self.blueprint_text.pack(fill=tk.X, expand=True)
+        
+        tk.Label(results_frame, text="Reconstructed String:", bg="#f0f0f0", font=default_font).pack(anchor=tk.W, pady=(10, 0))
+        self.reconstructed_text = scrolledtext.ScrolledText(results_frame, height=8, font=mono_font, wrap=tk.WORD, state=tk.DISABLED)
+        self.reconstructed_text.pack(fill=tk.X, expand=True)
+        
+        # Status/Log
+        status_frame = tk.Frame(self, padx=10, pady=5, bg="#f0f0f0")
+        status_frame.pack(fill=tk.X)
+        self.status_label = tk.Label(status_frame, text="Status: Idle", bg="#f0f0f0", anchor=tk.W)
+        self.status_label.pack(fill=tk.X)
+
+        # Full texts behind truncated widgets: widget -> (text shown, full text).
+        self.full_texts = {}
+        # The running compression: its process and the queue it reports on.
+        self.worker = None
+        self.progress = None
+        self.original_size = 0
+
+    def log_message(self, message):
+        self.status_label.config(text=f"Status: {message.strip()}")
+
+    def show_text(self, widget, text):
+        """Fills `widget` with `text`, cut to DISPLAY_LIMIT characters so Tk stays responsive."""
+        shown = text
+        if len(text) > DISPLAY_LIMIT:
+            shown = text[:DISPLAY_LIMIT] + TRUNCATION_NOTE.format(len(text) - DISPLAY_LIMIT)
+        state = widget.cget('state')
+        widget.config(state=tk.NORMAL)
+        widget.delete("1.0", tk.END)
+        widget.insert("1.0", shown)
+        widget.config(state=state)
+        self.full_texts[widget] = (shown, text)
+
+    def widget_text(self, widget):
+        """The full text behind `widget` while it still shows the preview, else what it holds now."""
+        content = widget.get("1.0", "end-1c")
+        shown, full = self.full_texts.get(widget, (None, None))
+        return full if content == shown else content.strip()
+
+    def load_file(self):
+        filepath = filedialog.askopenfilename(
+            title="Open Text File",
+            filetypes=(("Text Files", "*.txt"), ("All files", "*.*"))
+        )
+        if not filepath:
+            return
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                content = f.read()
+                self.show_text(self.input_text, content)
+                self.log_message(f"Loaded file: {os.path.basename(filepath)} ({len(content)} characters)")
+        except Exception as e:
+            messagebox.showerror("File Error", f"Failed to read file:\n{e}")
+
+    def run_compression(self):
+        original_string = self.widget_text(self.input_text)
+        if not original_string:
+            messagebox.showerror("Error", "Input string is empty.")
+            return
+
+        self.compress_button.config(state=tk.DISABLED)
+        self.decompress_button.config(state=tk.DISABLED)
+        self.save_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.progress_bar['value'] = 0
+        self.show_text(self.blueprint_text, "")
+        self.show_text(self.reconstructed_text, "")
+
+        # The engine runs in its own process, so the GUI stays responsive and can cancel it.
+        # 'spawn' keeps the child from inheriting Tk's state, which is not fork-safe.
+        context = multiprocessing.get_context('spawn')
+        self.original_size = len(original_string)
+        self.progress = context.Queue()
+        self.worker = context.Process(target=compress_worker, args=(original_string, self.progress), daemon=True)
+        self.worker.start()
+        self.log_message("Starting the engine...")
+        self.after(PROGRESS_INTERVAL_MS, self.drain_progress)
+
+    def drain_progress(self):
+        """Applies the engine's queued messages on the Tk thread, then reschedules itself."""
+        if self.worker is None:
+            return
+        last_message = None
+        for _ in range(MAX_MESSAGES_PER_DRAIN):
+            try:
+                kind, payload = self.progress.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'log':
+                last_message = payload
+                shards = SHARD_PROGRESS.search(payload)
+                if shards:
+                    self.progress_bar['value'] = 95 * int(shards.group(1)) / int(shards.group(2))
+            elif kind == 'done':
+                return self.finish_compression(payload)
+            else:
+                return self.finish_compression(None, f"Error during compression: {payload}")
+        if last_message and last_message.strip():
+            self.log_message(last_message)
+        if not self.worker.is_alive() and self.progress.empty():
+            return self.finish_compression(None, "Error during compression: the engine process exited.")
+        self.after(PROGRESS_INTERVAL_MS, self.drain_progress)
+
+    def finish_compression(self, compiled_blueprint, error=None):
+        self.worker = self.progress = None
+        self.compress_button.config(state=tk.NORMAL)
+        self.decompress_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        if compiled_blueprint is None:
+            self.progress_bar['value'] = 0
+            self.log_message(error)
+            return
+        self.progress_bar['value'] = 100
+        self.show_text(self.blueprint_text, compiled_blueprint)
+        self.save_button.config(state=tk.NORMAL)
+        compressed_size = len(compiled_blueprint)
+        reduction = (1 - compressed_size / self.original_size) * 100 if self.original_size > 0 else 0
+        self.log_message(f"Analysis Complete. Reduction: {reduction:.2f}%")
+
+    def cancel_compression(self):
+        if self.worker is not None:
+            self.worker.terminate()
+            self.worker.join()
+            self.finish_compression(None, "Compression cancelled.")
+
+    def save_blueprint(self):
+        compiled_blueprint = self.widget_text(self.blueprint_text)
+        filepath = filedialog.asksaveasfilename(
+            title="Save Blueprint", defaultextension=".vtt",
+            filetypes=(("Text Blueprints", "*.vtt"), ("All files", "*.*"))
+        )
+        if not filepath:
+            return
+        try:
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(compiled_blueprint)
+            self.log_message(f"Saved blueprint: {os.path.basename(filepath)} ({len(compiled_blueprint)} characters)")
+        except OSError as e:
+            messagebox.showerror("File Error", f"Failed to write file:\n{e}")
+
+    def run_reconstruction(self):
+        compiled_string = self.widget_text(self.blueprint_text)
+        if not compiled_string or '¬' not in compiled_string:
+            messagebox.showerror("Error", "Compiled blueprint is empty or invalid.")
+            return
+            
+        try:
+            reconstructed_string = VectorialTessellator.reconstruct(compiled_string)
+            self.show_text(self.reconstructed_text, reconstructed_string)
+
+            # Verification
+            original_string = self.widget_text(self.input_text)
+            if original_string == reconstructed_string:
+                messagebox.showinfo("Verification", "Success: Reconstructed string matches the original.")
+            else:
+                messagebox.showwarning("Verification", "Failure: Reconstructed string does not match the original.")
+        except Exception as e:
+            messagebox.showerror("Reconstruction Error", f"An error occurred: {e}")
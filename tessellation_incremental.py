@@ -0,0 +1,241 @@
+"""
+Append-only compression for texts that only ever grow, such as log files.
+
+A fresh 2D run re-plans its matrix widths from the whole text and scans all
+of it again, so every append costs as much as the text so far. The
+IncrementalTessellator instead keeps, between calls to append():
+
+- the matrix widths, planned once from about the first `context`
+  characters (a short first batch rarely shows the text's periods, so until
+  then appends are only buffered): a width-w layout is the text wrapped
+  every w characters, so appending only adds rows to it;
+- the claimed-position bitmap and the selected lines, in claim order;
+- the open lines: selected lines whose next point lies past the end of the
+  text and still inside their column range.
+
+append(text) extends the open lines into the new data first. It then scans
+each width's new rows, with about `context` characters of earlier text (at
+least a row) so that lines crossing the boundary are found, and claims the new lines that pay for
+themselves. Earlier lines are never moved or dropped, so the work per call is
+proportional to the appended text. blueprint() compiles the whole text in
+the 2D engine's formats, which VectorialTessellator.reconstruct reads.
+"""
+import io
+import math
+
+import numpy as np
+
+from tessellation_core import (encode_text, pad_codes, make_candidates, dedupe_candidates, select_candidates,
+                               decode_codes, write_blueprint, write_text_blueprint, CANDIDATE_DTYPE)
+from VectorialTessellation import VectorialTessellator, BLUEPRINT_FORMATS
+
+
+def _grow(buffer: np.ndarray, size: int, dtype=None) -> np.ndarray:
+    """`buffer`, or a copy at least twice as large, holding `size` items of `dtype` or wider."""
+    dtype = np.promote_types(buffer.dtype, dtype) if dtype is not None else buffer.dtype
+    if size <= len(buffer) and dtype == buffer.dtype:
+        return buffer
+    grown = np.zeros(max(size, 2 * len(buffer)), dtype=dtype)
+    grown[:len(buffer)] = buffer
+    return grown
+
+
+class IncrementalTessellator:
+    """
+    A 2D tessellator for a growing text: append() batches as they arrive,
+    and compile the blueprint of everything appended so far whenever needed.
+    """
+
+    # Dimensionality of the projections; tags binary blueprints.
+    ndim = 2
+
+    def __init__(self, format: str = 'text', widths=None, max_widths: int = 16, context: int = 4096,
+                 update_callback=None):
+        if format not in BLUEPRINT_FORMATS:
+            raise ValueError(f"Unknown blueprint format: {format}")
+        # Lines are priced in this format, so it is fixed for the stream's lifetime.
+        self.format = format
+        # Matrix widths; None plans up to max_widths from the first `context` characters, as the
+        # 2D engine would.
+        self.widths = sorted(set(widths) | {1}) if widths else None
+        self.max_widths = max_widths
+        self.context = context
+        self.update_callback = update_callback or (lambda message: None)
+        self.length = 0
+        # Code points and claimed flags, in buffers that double as the text grows.
+        self._codes = np.zeros(0, dtype=np.uint8)
+        self._claimed = np.zeros(0, dtype=bool)
+        # Selected lines in claim order, as candidate records whose shard indexes self.shards.
+        self._lines = np.zeros(0, dtype=CANDIDATE_DTYPE)
+        self.line_count = 0
+        # (char, (0, width)) per shard; only the width matters to a line's description.
+        self.shards = []
+        self._shard_ids = {}
+        # Indices of the lines that may still grow into appended text.
+        self.open = []
+
+    def __getstate__(self):
+        # The callback is often a lambda; a restored stream gets a silent one.
+        state = dict(self.__dict__)
+        state['update_callback'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.update_callback = self.update_callback or (lambda message: None)
+
+    @property
+    def codes(self) -> np.ndarray:
+        return self._codes[:self.length]
+
+    @property
+    def claimed_positions(self) -> np.ndarray:
+        return self._claimed[:self.length]
+
+    @property
+    def lines(self) -> np.ndarray:
+        """The selected lines, in claim order."""
+        return self._lines[:self.line_count]
+
+    def _shard(self, char: str, width: int) -> int:
+        key = (char, width)
+        if key not in self._shard_ids:
+            self._shard_ids[key] = len(self.shards)
+            self.shards.append((char, (0, width)))
+        return self._shard_ids[key]
+
+    @staticmethod
+    def _column_steps(line, width: int) -> int:
+        """How many more points fit after the line's last one before its column leaves the matrix."""
+        start, stride, count = int(line['start']), int(line['stride']), int(line['count'])
+        dx = (start + stride) % width - start % width
+        x = (start + stride * (count - 1)) % width
+        if dx > 0:
+            return (width - 1 - x) // dx
+        if dx < 0:
+            return x // -dx
+        return math.inf
+
+    def _is_open(self, line) -> bool:
+        end = int(line['start']) + int(line['stride']) * (int(line['count']) - 1)
+        width = self.shards[line['shard']][1][1]
+        return end + int(line['stride']) >= self.length and self._column_steps(line, width) > 0
+
+    def append(self, text) -> dict:
+        """
+        Adds `text` to the end of the stream: extends the open lines, then
+        scans and claims lines reaching into it. Returns what changed, which
+        is nothing while the first `context` characters are being buffered.
+        """
+        new = text if isinstance(text, np.ndarray) else encode_text(text)
+        old_length, self.length = self.length, self.length + len(new)
+        self._codes = _grow(self._codes, self.length, new.dtype)
+        self._codes[old_length:self.length] = new
+        self._claimed = _grow(self._claimed, self.length)
+        if not len(new):
+            return {'extended': 0, 'points': 0, 'lines': 0}
+        chars = np.unique(new)
+        if self.widths is None:
+            if self.length < self.context:
+                return {'extended': 0, 'points': 0, 'lines': 0}
+            # Nothing was scanned while buffering, so the whole text is new to the planned widths.
+            old_length, chars = 0, np.unique(self.codes)
+            self._plan_widths()
+
+        extended, points = self._extend_open_lines()
+        selected = self._claim_new_lines(old_length, chars)
+        self.update_callback(f"  Appended {len(new)} characters: {extended} open lines grew by {points} points, "
+                             f"{selected} new lines claimed, {len(self.open)} lines open.")
+        return {'extended': extended, 'points': points, 'lines': selected}
+
+    def _plan_widths(self):
+        planner = VectorialTessellator(self.codes, update_callback=self.update_callback,
+                                       max_widths=self.max_widths)
+        planner.format = self.format
+        self.widths = planner._get_matrix_widths()
+        self.update_callback(f"  Planned widths {self.widths} from the first {self.length} characters.")
+
+    def _extend_open_lines(self):
+        """Grows every open line along its stride while the appended text repeats its character."""
+        codes, claimed = self.codes, self.claimed_positions
+        still_open, extended, points = [], 0, 0
+        for index in self.open:
+            line = self._lines[index]
+            char, (_, width) = self.shards[line['shard']]
+            stride = int(line['stride'])
+            last = int(line['start']) + stride * (int(line['count']) - 1)
+            room = self._column_steps(line, width)
+            steps = min(room, (self.length - 1 - last) // stride)
+            positions = last + stride * np.arange(1, steps + 1, dtype=np.int64)
+            match = (codes[positions] == ord(char)) & ~claimed[positions]
+            grown = steps if match.all() else int(np.argmin(match))
+            if grown:
+                claimed[positions[:grown]] = True
+                self._lines['count'][index] += grown
+                extended += 1
+                points += grown
+            # A line that stopped on a mismatch or at its column's edge is closed for good.
+            if grown == steps and steps < room:
+                still_open.append(index)
+        self.open = still_open
+        return extended, points
+
+    def _claim_new_lines(self, old_length: int, chars) -> int:
+        """Scans each width's rows from a little before `old_length` and claims the lines found there."""
+        blocks = []
+        for width in self.widths:
+            lo = max(0, (old_length // width - max(1, self.context // width)) * width)
+            rows = -(-(self.length - lo) // width)
+            matrix = pad_codes(self.codes[lo:], rows * width).reshape(rows, width)
+            for code in chars.tolist():
+                char = chr(code)
+                block = VectorialTessellator._find_line_candidates_in_matrix(matrix, char, self.format, offset=lo)
+                # Lines wholly inside the earlier text had their chance on an earlier append.
+                block = block[block['start'] + block['stride'] * (block['count'].astype(np.int64) - 1) >= old_length]
+                block['shard'] = self._shard(char, width)
+                blocks.append(block)
+        candidates = dedupe_candidates(np.concatenate(blocks)) if blocks else make_candidates([], [], [], [])
+        selected = candidates[select_candidates(candidates, self.claimed_positions)]
+        self._lines = _grow(self._lines, self.line_count + len(selected))
+        self._lines[self.line_count:self.line_count + len(selected)] = selected
+        for index in range(self.line_count, self.line_count + len(selected)):
+            if self._is_open(self._lines[index]):
+                self.open.append(index)
+        self.line_count += len(selected)
+        return len(selected)
+
+    def key(self):
+        """Vector descriptions of the selected lines, in claim order."""
+        return [VectorialTessellator._describe_line(self.shards[shard][0], self.shards[shard][1], start,
+                                                    start + stride * (count - 1))
+                for shard, start, stride, count in self.lines[['shard', 'start', 'stride', 'count']].tolist()]
+
+    def write_blueprint(self, dst):
+        """
+        Compiles the blueprint of the whole text so far into the binary stream
+        `dst`. A stream still shorter than `context` has its widths planned
+        and its lines claimed now, so later appends keep those widths.
+        """
+        if self.widths is None and self.length:
+            self._plan_widths()
+            self._claim_new_lines(0, np.unique(self.codes))
+        remnant = self.codes[~self.claimed_positions]
+        lines = self.lines
+        if self.format == 'binary':
+            shard_codes = np.array([ord(char) for char, _ in self.shards], dtype=np.int64)
+            write_blueprint(dst, self.ndim, self.length, shard_codes[lines['shard']], lines['start'],
+                            lines['stride'], lines['count'], remnant)
+        else:
+            write_text_blueprint(dst, self.length, self.key(), remnant)
+
+    def blueprint(self):
+        """The whole text's blueprint: bytes for 'binary', a 'length¬key‡remnant' string for 'text'."""
+        buffer = io.BytesIO()
+        self.write_blueprint(buffer)
+        return buffer.getvalue() if self.format == 'binary' else buffer.getvalue().decode('utf-8')
+
+    def text(self) -> str:
+        """Everything appended so far."""
+        return decode_codes(self.codes)
+
+    reconstruct = staticmethod(VectorialTessellator.reconstruct)
@@ -0,0 +1,107 @@
+"""
+Structured instrumentation for the tessellators. An EngineStats records the
+wall time of each phase and, for every scanned (char, shape) shard, how long
+its scan took and what it yielded: candidates found, candidates rejected
+(duplicates, or overlapped by better lines), positions claimed and the
+characters (text format) or bytes (binary format) saved.
+"""
+import cProfile
+import io
+import pstats
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class EngineStats:
+    """
+    Timers and counters of one tessellator run. With profile=True every
+    timed phase also runs under cProfile, and profile_report() summarizes it.
+    """
+
+    def __init__(self, profile: bool = False):
+        self.phases = {}
+        # The (char, shape) shards of the scan plan; the arrays below are indexed like it.
+        self.shards = []
+        self.scan_seconds = {}
+        self.found = self.selected = self.claimed = self.saved = np.zeros(0, dtype=np.int64)
+        self.profiler = cProfile.Profile() if profile else None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Times the enclosed block as phase `name`, profiling it if asked to."""
+        start = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+        try:
+            yield
+        finally:
+            if self.profiler is not None:
+                self.profiler.disable()
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def record_scan(self, shard: int, seconds: float):
+        """Time spent waiting for shard `shard`'s candidates (scanned, or read from a cache)."""
+        self.scan_seconds[shard] = self.scan_seconds.get(shard, 0.0) + seconds
+
+    def record_candidates(self, shards, candidates: np.ndarray):
+        """Per-shard counts of the candidates the scan found, before duplicates are merged."""
+        self.shards = list(shards)
+        self.found = np.bincount(candidates['shard'], minlength=len(self.shards))
+
+    def record_selection(self, selected: np.ndarray):
+        """Per-shard counts of the lines selection claimed, their positions and their savings."""
+        shards = selected['shard']
+        size = len(self.shards)
+        self.selected = np.bincount(shards, minlength=size)
+        self.claimed = np.bincount(shards, weights=selected['count'], minlength=size).astype(np.int64)
+        self.saved = np.bincount(shards, weights=selected['savings'], minlength=size).astype(np.int64)
+
+    def shard_rows(self):
+        """One dict per scanned shard, in plan order."""
+        rows = []
+        for shard in sorted(self.scan_seconds):
+            char, shape = self.shards[shard]
+            found = int(self.found[shard]) if shard < len(self.found) else 0
+            selected = int(self.selected[shard]) if shard < len(self.selected) else 0
+            rows.append({'char': char, 'shape': list(shape), 'seconds': self.scan_seconds[shard],
+                         'found': found, 'rejected': found - selected,
+                         'claimed': int(self.claimed[shard]) if shard < len(self.claimed) else 0,
+                         'saved': int(self.saved[shard]) if shard < len(self.saved) else 0})
+        return rows
+
+    def hot_shards(self, top: int = 10):
+        """The `top` shards that took longest to scan, slowest first."""
+        return sorted(self.shard_rows(), key=lambda row: -row['seconds'])[:top]
+
+    def as_dict(self) -> dict:
+        """Phase timings, run totals and per-shard rows, as plain JSON-ready values."""
+        found = int(self.found.sum())
+        return {
+            'phases': dict(self.phases),
+            'totals': {'shardsScanned': len(self.scan_seconds), 'candidatesFound': found,
+                       'candidatesRejected': found - int(self.selected.sum()),
+                       'positionsClaimed': int(self.claimed.sum()), 'saved': int(self.saved.sum())},
+            'shards': self.shard_rows(),
+        }
+
+    def report(self, top: int = 5) -> str:
+        """Phase timings and the `top` hottest shards, then the profile if any; empty before a run."""
+        lines = []
+        if self.phases:
+            lines.append("Phases: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.phases.items()))
+            for row in self.hot_shards(top):
+                lines.append(f"  - '{row['char']}' {tuple(row['shape'])}: {row['seconds']:.3f}s, {row['found']} found, "
+                             f"{row['rejected']} rejected, {row['claimed']} claimed, {row['saved']} saved")
+        if self.profiler is not None:
+            lines.append(self.profile_report())
+        return "\n".join(lines)
+
+    def profile_report(self, limit: int = 25, sort: str = 'cumulative') -> str:
+        """The profiled functions, `limit` at most, as pstats prints them; empty without profiling."""
+        if self.profiler is None:
+            return ''
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()